@@ -1,90 +1,158 @@
 # analysis.py
 
-import requests
 import pandas as pd
-from ta import add_all_ta_features
-from ta.utils import dropna
-from pyfinmod.financials import Financials
-from pyfinmod.ev import fcf, dcf
+from pyfinmod.ev import fcf
 from pyfinmod.wacc import wacc
 import numpy as np
-from utils import rate_limit
+from utils import cache_data, get_cached_data
+from llm_client import get_client, LLMError
+from price_store import PriceStore
+from sec_store import FilingSectionStore
+from filing_parser import FilingParserPool
+from valuation import dcf_grid, summarize_grid
+from insider import aggregate_insider_trades
+from indicators import compute_indicators, latest_values, stack_series, DEFAULT_INDICATORS
 import yfinance as yf
+from datetime import date
+
+def _statement_value(statement, labels):
+    # Latest value of the first matching line item, whichever way the statement is oriented
+    for frame in (statement, statement.T):
+        for label in frame.index:
+            if str(label).replace(' ', '').lower() in labels:
+                row = frame.loc[label]
+                if hasattr(row, 'iloc'):
+                    row = pd.to_numeric(row, errors='coerce').dropna().sort_index()
+                    return float(row.iloc[-1]) if len(row) else None
+                return float(row)
+    return None
+
+def _net_debt(balance_sheet):
+    debt = _statement_value(balance_sheet, {'totaldebt'}) or 0.0
+    cash = _statement_value(balance_sheet, {'cashandcashequivalents', 'cashandshortterminvestments'}) or 0.0
+    return debt - cash
 
 class Analyzer:
     def __init__(self, config):
         self.config = config
+        self.llm = get_client(config)
+        self.prices = PriceStore()
+        self.filing_store = FilingSectionStore()
+        self.filing_parser = FilingParserPool(
+            max_workers=getattr(config, 'FILING_PARSER_WORKERS', None),
+            queue_size=getattr(config, 'FILING_PARSER_QUEUE_SIZE', None)
+        )
 
-    @rate_limit(5)  # Limit to 5 requests per second
     def summarize_findings(self, text):
         # Use OpenRouter and FAST_LLM for summarization
-        headers = {
-            "Authorization": f"Bearer {self.config.OPENROUTER_API_KEY}",
-        }
-        data = {
-            "model": self.config.FAST_LLM,
-            "messages": [
-                {"role": "user", "content": f"Summarize the following text:\n\n{text}"}
-            ]
-        }
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=data
-        )
-        if response.status_code == 200:
-            result = response.json()
-            return result['choices'][0]['message']['content'].strip()
-        else:
-            print(f"Error in LLM summarization: {response.text}")
-            return ""
+        messages = [
+            {"role": "user", "content": f"Summarize the following text:\n\n{text}"}
+        ]
+        try:
+            return self.llm.chat(self.config.FAST_LLM, messages)
+        except LLMError as e:
+            print(f"Error in LLM summarization: {e}")
+            raise
 
     def analyze_sec_filings(self, filings):
-        important_sections = []
-        for filing in filings:
-            try:
-                if filing.form in ['10-K', '10-Q', 'S-1']:
-                    sections = filing.sections()
-                    key_sections = {k: v for k, v in sections.items() if k in ['Business', 'Risk Factors', 'Management’s Discussion and Analysis']}
-                    important_sections.append(key_sections)
-                else:
-                    important_sections.append(filing.full_text_submission())
-            except Exception as e:
-                print(f"Error processing filing: {e}")
-                continue
-        return important_sections
-
-    def perform_dcf_analysis(self, financials):
+        filings = list(filings)
+        # Each filing is downloaded and parsed once; later runs read the stored sections
+        stored = {filing.accession_no: self.filing_store.get(filing.accession_no) for filing in filings}
+        missing = [filing for filing in filings if stored[filing.accession_no] is None]
+
+        # Section extraction is CPU-bound, so it runs in the shared process pool
+        parsed = self.filing_parser.parse_many(missing, getattr(self.config, 'SEC_SECTION_MAX_CHARS', 20000))
+        for filing in missing:
+            if filing.accession_no in parsed:
+                sections = parsed[filing.accession_no]
+                self.filing_store.put(filing.accession_no, filing.form, filing.filing_date, sections)
+                stored[filing.accession_no] = sections
+
+        return [stored[filing.accession_no] for filing in filings if stored[filing.accession_no] is not None]
+
+    def perform_dcf_analysis(self, financials, quote=None):
+        return self.perform_dcf_analysis_batch([(financials, quote)])[0]
+
+    def perform_dcf_analysis_batch(self, items):
+        # items: [(financials, quote)]
+        return self.value_dcf([self.dcf_inputs(financials, quote) for financials, quote in items])
+
+    def dcf_inputs(self, financials, quote=None):
+        # Per-ticker part of the DCF: reading the statements may fetch them, so callers with
+        # many tickers run this concurrently; None when the statements are unusable
         try:
-            cash_flows = fcf(financials.cash_flow_statement)
-            cost_of_capital = wacc(
-                financials.mktCap,
-                financials.balance_sheet_statement,
-                financials.income_statement,
-                financials.beta,
-                risk_free_interest_rate=0.02,
-                market_return=0.08
-            )
-            dcf_value = dcf(
-                cash_flows,
-                cost_of_capital,
-                short_term_growth=0.05,
-                long_term_growth=0.03
-            )
-            return dcf_value
+            return self._dcf_inputs(financials, quote or {})
         except Exception as e:
             print(f"Error performing DCF analysis: {e}")
             return None
 
+    def value_dcf(self, inputs):
+        # Every ticker's sensitivity grid valued in one NumPy pass; None inputs stay None
+        valid = [i for i, row in enumerate(inputs) if row is not None]
+        results = [None] * len(inputs)
+        if not valid:
+            return results
+        columns = {key: np.array([inputs[i][key] for i in valid], dtype=float) for key in inputs[valid[0]]}
+        grid = dcf_grid(columns['base_fcf'], columns['wacc'], net_debt=columns['net_debt'], shares=columns['shares'])
+        for i, summary in zip(valid, summarize_grid(grid, prices=[inputs[i]['price'] for i in valid])):
+            if summary is not None:
+                summary['wacc'] = round(float(inputs[i]['wacc']), 4)
+            results[i] = summary
+        return results
+
+    def _dcf_inputs(self, financials, quote):
+        cash_flows = fcf(financials.cash_flow_statement)
+        if hasattr(cash_flows, 'sort_index'):
+            cash_flows = cash_flows.dropna().sort_index().iloc[-1]
+        cost_of_capital = wacc(
+            financials.mktCap,
+            financials.balance_sheet_statement,
+            financials.income_statement,
+            financials.beta,
+            risk_free_interest_rate=getattr(self.config, 'DCF_RISK_FREE_RATE', 0.02),
+            market_return=getattr(self.config, 'DCF_MARKET_RETURN', 0.08)
+        )
+        price = quote.get('price')
+        market_cap = quote.get('market_cap') or financials.mktCap
+        return {
+            'base_fcf': float(cash_flows),
+            'wacc': float(cost_of_capital),
+            'net_debt': _net_debt(financials.balance_sheet_statement),
+            # Shares implied by the quote snapshot; without them values stay at equity level
+            'shares': market_cap / price if market_cap and price else np.nan,
+            'price': price
+        }
+
     def perform_technical_analysis(self, stock_data):
-        df = stock_data.history(period='1y')
-        df = dropna(df)
-        df = add_all_ta_features(
-            df, open="Open", high="High", low="Low", close="Close", volume="Volume"
+        return self.perform_technical_analysis_batch([stock_data])[stock_data.ticker]
+
+    def perform_technical_analysis_batch(self, stock_datas):
+        return self.technical_summary(
+            [stock_data.ticker for stock_data in stock_datas],
+            [self.price_window(stock_data) for stock_data in stock_datas]
         )
-        return df
 
-    def analyze_insider_trading(self, ticker):
-        company = yf.Ticker(ticker)
+    def price_window(self, stock_data, days=365):
+        # Served from the local price store; only bars newer than the last stored date are downloaded
+        return self.prices.window(stock_data.ticker, stock_data, days=days)
+
+    def technical_summary(self, tickers, windows):
+        # Indicators for every ticker in one NumPy pass over windows from price_window
+        data = {field: stack_series([bars[field] for bars in windows]) for field in ('close', 'high', 'low', 'volume')}
+
+        names = getattr(self.config, 'TECHNICAL_INDICATORS', DEFAULT_INDICATORS)
+        results = compute_indicators(data, names)
+        return dict(zip(tickers, latest_values(results, data['close'])))
+
+    def analyze_insider_trading(self, ticker, stock_data=None):
+        # Compact features cached per ticker per day; the raw frame never leaves this method
+        cache_key = f"insider_{ticker.upper()}_{date.today().isoformat()}"
+        features = get_cached_data(cache_key)
+        if features is not None:
+            return features
+
+        company = stock_data if stock_data is not None else yf.Ticker(ticker)
         insider_trades = company.get_insider_transactions()
-        return insider_trades
\ No newline at end of file
+        features = aggregate_insider_trades(insider_trades)
+        cache_data(cache_key, features)
+        return features
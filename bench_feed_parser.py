@@ -0,0 +1,66 @@
+# bench_feed_parser.py
+
+import argparse
+import time
+import tracemalloc
+from feeds import iter_feed_items, FEED_CHUNK_SIZE
+
+def build_feed(num_items):
+    items = []
+    for i in range(num_items):
+        items.append(f"""
+    <item>
+      <title>Company {i} announces tender offer</title>
+      <link>https://example.com/articles/{i}</link>
+      <guid>https://example.com/articles/{i}</guid>
+      <pubDate>Mon, 01 Jan 2024 00:00:00 GMT</pubDate>
+      <description><![CDATA[<p>Company {i} Inc. agreed to a merger with Acquirer {i} Corp. {'Lorem ipsum dolor sit amet. ' * 20}</p>]]></description>
+    </item>""")
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel><title>Benchmark feed</title>{''.join(items)}
+</channel></rss>""".encode('utf-8')
+
+def parse_bs4(content):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, features='xml')
+    return [{
+        'title': item.title.text,
+        'link': item.link.text,
+        'guid': item.guid.text if item.guid else None,
+        'published': item.pubDate.text,
+        'description': item.description.text
+    } for item in soup.findAll('item')]
+
+def parse_streaming(content):
+    chunks = (content[i:i + FEED_CHUNK_SIZE] for i in range(0, len(content), FEED_CHUNK_SIZE))
+    return list(iter_feed_items(chunks))
+
+def measure(name, parse, content, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        articles = parse(content)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    parse(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<10} items={len(articles):<6} best={min(timings) * 1000:8.1f} ms  peak={peak / 1024 / 1024:7.1f} MiB")
+    return articles
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the BeautifulSoup and streaming RSS parsers")
+    parser.add_argument("--items", type=int, default=5000, help="Number of items in the synthetic feed")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per parser")
+    args = parser.parse_args()
+
+    content = build_feed(args.items)
+    print(f"Feed size: {len(content) / 1024 / 1024:.1f} MiB")
+    streamed = measure("streaming", parse_streaming, content, args.repeat)
+    try:
+        soup_articles = measure("bs4", parse_bs4, content, args.repeat)
+    except ImportError:
+        print("bs4 / lxml not installed, skipping BeautifulSoup parser")
+    else:
+        print(f"Outputs match: {streamed == soup_articles}")
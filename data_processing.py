@@ -3,36 +3,84 @@
 import yfinance as yf
 from edgar import Company
 from exa_py import Exa
-from pyfinmod.financials import Financials
 from pyfinmod.ev import fcf, dcf
 from pyfinmod.wacc import wacc
 import pandas as pd
+import xml.etree.ElementTree as ET
 import requests
-from bs4 import BeautifulSoup
+import logging
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from market_data import QuoteSnapshot
+from fundamentals import FundamentalsCache, filing_period
+from feeds import FeedStateStore, article_key, conditional_get, iter_feed_items, FEED_CHUNK_SIZE
+
+# Most recent filings kept per form. Periodic reports are kept if filed within the
+# last PERIODIC_MAX_AGE_DAYS; everything else only inside the lookback window.
+SEC_FILING_LIMITS = {
+    '10-K': 1, '10-Q': 1, '20-F': 1, '8-K': 5, '6-K': 5, 'S-1': 1, 'S-4': 1,
+    'SC 13D': 3, 'SC 13G': 2, 'DEFA14A': 2, 'DEF 14A': 1, 'PRE 14A': 1, '4': 10
+}
+PERIODIC_FORMS = {'10-K', '10-Q', '20-F'}
+PERIODIC_MAX_AGE_DAYS = 400
+
+def select_recent_filings(filings, limits, lookback_days):
+    cutoff = date.today() - timedelta(days=lookback_days)
+    periodic_cutoff = date.today() - timedelta(days=PERIODIC_MAX_AGE_DAYS)
+    counts = defaultdict(int)
+    selected = []
+    # Filings come newest first, so nothing past the periodic cutoff is needed
+    for filing in filings:
+        form = filing.form
+        filing_date = filing.filing_date
+        if isinstance(filing_date, str):
+            filing_date = date.fromisoformat(filing_date)
+        if filing_date < periodic_cutoff:
+            break
+        if form not in PERIODIC_FORMS and filing_date < cutoff:
+            continue
+        if counts[form] >= limits.get(form, 0):
+            continue
+        counts[form] += 1
+        selected.append(filing)
+    return selected
 
 class DataProcessor:
     def __init__(self, config):
         self.exa = Exa(api_key=config.EXA_API_KEY)
         self.config = config
+        self.session = requests.Session()
+        self.feed_state = FeedStateStore()
+        # ETag/Last-Modified per feed URL, stored by mark_processed once the run has used the items
+        self.pending_validators = {}
+        self.fundamentals = FundamentalsCache()
+        self.quotes = QuoteSnapshot(ttl=getattr(config, 'QUOTE_CACHE_TTL', 300))
 
     def get_stock_data(self, ticker):
         stock = yf.Ticker(ticker)
         return stock
 
+    def get_quote_snapshot(self, tickers):
+        return self.quotes.get(tickers)
+
     def get_sec_filings(self, ticker):
         company = Company(ticker)
-        # Expanded list of forms to include more relevant filings
-        forms_to_include = [
-            '10-K', '10-Q', '8-K', '6-K', '20-F', 'S-1', 'S-4', '424B2', '424B3',
-            'SC 13D', 'SC 13G', 'DEFA14A', 'DEF 14A', 'PRE 14A', 'POS AM',
-            'Form 3', 'Form 4', 'Form 5', 'SD', '11-K'
-        ]
-        filings = company.get_filings().filter(form=forms_to_include)
-        return filings
-
-    def get_financials(self, ticker):
-        parser = Financials(ticker)
-        return parser
+        limits = getattr(self.config, 'SEC_FILING_LIMITS', SEC_FILING_LIMITS)
+        # Only forms with a limit are kept, so only those are requested from EDGAR
+        forms_to_include = [form for form, limit in limits.items() if limit > 0]
+        filings = company.get_filings(form=forms_to_include)
+        return select_recent_filings(
+            filings,
+            limits=limits,
+            lookback_days=getattr(self.config, 'SEC_FILING_LOOKBACK_DAYS', 90)
+        )
+
+    def get_financials(self, ticker, sec_filings=None):
+        # Shared, lazily loaded statements; DCF, WACC and any other stage reuse the same object.
+        # Passing the ticker's filings keys the cache on its latest 10-Q/10-K.
+        return self.fundamentals.get(ticker, filing_period(sec_filings))
 
     def get_news_articles(self, query):
         response = self.exa.search_and_contents(query, type='neural', num_results=5)
@@ -45,17 +93,52 @@ class DataProcessor:
             })
         return articles
 
-    def fetch_rss_articles(self, feed_urls):
+    def fetch_rss_articles(self, feed_urls, only_new=True):
+        workers = getattr(self.config, 'RSS_FETCH_WORKERS', 8)
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(feed_urls)))) as executor:
+            per_feed = list(executor.map(self._fetch_feed, feed_urls))
+
+        # Keep feed order so articles come out in the same order as before
+        articles = [article for feed_articles in per_feed for article in feed_articles]
+        if only_new:
+            fetched = len(articles)
+            articles = self.feed_state.filter_unseen(articles)
+            logging.info(f"{len(articles)} of {fetched} fetched articles are new")
+        return articles
+
+    def mark_processed(self, articles, retry=()):
+        # Articles stop counting as new only after a run has processed them; those in retry
+        # stay new. Validators wait too, and are dropped while anything is left to retry,
+        # or a 304 on the next poll would hide those items.
+        retry_keys = {article_key(article) for article in retry}
+        self.feed_state.mark_seen([article for article in articles if article_key(article) not in retry_keys])
+        pending, self.pending_validators = self.pending_validators, {}
+        if retry_keys:
+            return
+        for url, (etag, last_modified) in pending.items():
+            self.feed_state.set_validators(url, etag, last_modified)
+
+    def iter_rss_articles(self, url):
+        response = conditional_get(self.session, url, self.feed_state, getattr(self.config, 'RSS_FETCH_TIMEOUT', 15))
+        if response is None:
+            return
+        with response:
+            yield from iter_feed_items(response.iter_content(chunk_size=FEED_CHUNK_SIZE))
+        # Only remember validators once the feed has been parsed successfully
+        self.pending_validators[url] = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+    def _fetch_feed(self, url):
+        start = time.perf_counter()
         articles = []
-        for url in feed_urls:
-            response = requests.get(url)
-            soup = BeautifulSoup(response.content, features='xml')
-            items = soup.findAll('item')
-            for item in items:
-                articles.append({
-                    'title': item.title.text,
-                    'link': item.link.text,
-                    'published': item.pubDate.text,
-                    'description': item.description.text
-                })
-        return articles
\ No newline at end of file
+        try:
+            # Appended one by one so items parsed before an error are kept
+            for article in self.iter_rss_articles(url):
+                articles.append(article)
+        except ET.ParseError as e:
+            # The streaming parser is strict about structure (e.g. mismatched tags); keep what was parsed
+            logging.warning(f"Malformed feed {url} after {len(articles)} items: {str(e)}")
+        except Exception as e:
+            logging.error(f"Error fetching feed {url}: {str(e)}")
+            return articles
+        logging.info(f"Fetched {len(articles)} items from {url} in {time.perf_counter() - start:.2f}s")
+        return articles
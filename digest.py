@@ -0,0 +1,60 @@
+# digest.py
+
+import json
+import logging
+import re
+
+CHARS_PER_TOKEN = 4
+
+TECHNICAL_FIELDS = [
+    'close', 'rsi', 'macd_hist', 'atr_pct', 'bb_percent_b', 'volume_zscore',
+    'sma_50', 'sma_200', 'return_5d', 'return_20d', 'return_60d'
+]
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN
+
+def clip_text(text, max_tokens):
+    text = re.sub(r'\s+', ' ', str(text)).strip()
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(' ', 1)[0] + ' ...'
+
+def digest_technicals(summary):
+    if not summary:
+        return None
+    return {field: summary.get(field) for field in TECHNICAL_FIELDS if summary.get(field) is not None}
+
+def digest_filings(sec_analysis, token_budget):
+    # Clips filing sections so all filings together stay within token_budget
+    pieces = []
+    for filing in sec_analysis or []:
+        if isinstance(filing, dict):
+            pieces.extend((name, text) for name, text in filing.items() if text)
+        elif filing:
+            pieces.append(('Filing', filing))
+    if not pieces:
+        return []
+    per_piece = max(50, token_budget // len(pieces))
+    return [{'section': name, 'text': clip_text(text, per_piece)} for name, text in pieces[:max(1, token_budget // per_piece)]]
+
+def build_digest(ticker, sec_analysis=None, dcf_value=None, tech_analysis=None, insider_trades=None, quote=None, filing_token_budget=1500):
+    record = {'ticker': ticker}
+    if quote:
+        record['quote'] = {k: v for k, v in quote.items() if v is not None}
+    if dcf_value is not None:
+        # Valuation range from the DCF sensitivity grid
+        record['dcf'] = dcf_value
+    record['technicals'] = digest_technicals(tech_analysis)
+    record['insider_trading'] = insider_trades
+    record['filings'] = digest_filings(sec_analysis, filing_token_budget)
+    return record
+
+def format_digest(record):
+    text = json.dumps(record, default=str, separators=(',', ':'))
+    logging.info(
+        f"Findings prompt for {record['ticker']}: {len(text)} chars (~{estimate_tokens(text)} tokens), "
+        f"{len(record['filings'])} filing sections"
+    )
+    return text
@@ -0,0 +1,73 @@
+# entity_cache.py
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from ticker_resolver import normalize_company_name
+from utils import CACHE_DIR
+
+# Returned by EntityCache.get when a name has no live entry; None is a cached "no ticker"
+MISSING = object()
+
+def entity_key(name):
+    # "Faraday Future Intelligent Electric Inc." and "faraday future intelligent electric" share a key
+    return normalize_company_name(name) or name.strip().lower()
+
+class EntityCache:
+    def __init__(self, path=os.path.join(CACHE_DIR, 'entities.sqlite'), ttl=30 * 24 * 3600, negative_ttl=7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        # Misses expire sooner: a new listing or a better index should get a chance
+        self.negative_ttl = negative_ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entities ("
+            "key TEXT PRIMARY KEY, name TEXT, ticker TEXT, source TEXT, resolved_at REAL)"
+        )
+        self._conn.commit()
+        self.stats = {'hits': 0, 'negative_hits': 0, 'misses': 0}
+
+    def get(self, name):
+        key = entity_key(name)
+        with self._lock:
+            row = self._conn.execute("SELECT ticker, resolved_at FROM entities WHERE key = ?", (key,)).fetchone()
+            ttl = self.ttl if row and row[0] else self.negative_ttl
+            if row is None or (ttl and time.time() - row[1] > ttl):
+                self.stats['misses'] += 1
+                return MISSING
+            self.stats['hits' if row[0] else 'negative_hits'] += 1
+            return row[0]
+
+    def put(self, name, ticker, source):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entities (key, name, ticker, source, resolved_at) VALUES (?, ?, ?, ?, ?)",
+                (entity_key(name), name, ticker, source, time.time())
+            )
+            self._conn.commit()
+
+    def log_stats(self):
+        stats = self.stats
+        total = sum(stats.values())
+        if not total:
+            return
+        logging.info(
+            f"Entity cache: {stats['hits']} tickers and {stats['negative_hits']} known misses served "
+            f"from cache, {stats['misses']} names resolved"
+        )
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_entity_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EntityCache()
+        return _cache
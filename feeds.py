@@ -0,0 +1,179 @@
+# feeds.py
+
+import html.entities
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from utils import CACHE_DIR
+
+FEED_CHUNK_SIZE = 64 * 1024
+
+class FeedStateStore:
+    def __init__(self, path=os.path.join(CACHE_DIR, 'feeds.sqlite'), retention_days=90):
+        self.path = path
+        self.retention_days = retention_days
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS feeds (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS seen_articles (key TEXT PRIMARY KEY, first_seen REAL)")
+        self._conn.commit()
+
+    def get_validators(self, url):
+        with self._lock:
+            row = self._conn.execute("SELECT etag, last_modified FROM feeds WHERE url = ?", (url,)).fetchone()
+        return row if row else (None, None)
+
+    def set_validators(self, url, etag, last_modified):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO feeds (url, etag, last_modified) VALUES (?, ?, ?)",
+                (url, etag, last_modified)
+            )
+            self._conn.commit()
+
+    def filter_unseen(self, articles):
+        # Returns articles not marked seen by an earlier run; marking waits for mark_seen
+        with self._lock:
+            return [
+                article for article in articles
+                if not self._conn.execute("SELECT 1 FROM seen_articles WHERE key = ?", (article_key(article),)).fetchone()
+            ]
+
+    def mark_seen(self, articles):
+        # Called once a run has finished with the articles, so a crash mid-run leaves them new
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO seen_articles (key, first_seen) VALUES (?, ?)",
+                [(article_key(article), now) for article in articles]
+            )
+            self._conn.execute(
+                "DELETE FROM seen_articles WHERE first_seen < ?",
+                (now - self.retention_days * 24 * 3600,)
+            )
+            self._conn.commit()
+
+def article_key(article):
+    return article.get('guid') or article['link']
+
+def conditional_get(session, url, store, timeout):
+    etag, last_modified = store.get_validators(url)
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    start = time.perf_counter()
+    # Streamed so items can be parsed while the body is still downloading
+    response = session.get(url, headers=headers, timeout=timeout, stream=True)
+    if response.status_code == 304:
+        logging.info(f"Feed {url} not modified (304) in {time.perf_counter() - start:.2f}s")
+        response.close()
+        return None
+    response.raise_for_status()
+    return response
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+def _normalize_item(element):
+    fields = {}
+    for child in element:
+        name = _local_name(child.tag)
+        text = (child.text or '').strip()
+        if name == 'link' and not text:
+            # Atom links carry the URL in href
+            text = child.get('href', '')
+        if name not in fields:
+            fields[name] = text
+    return {
+        'title': fields.get('title', ''),
+        'link': fields.get('link', ''),
+        'guid': fields.get('guid') or fields.get('id') or None,
+        'published': fields.get('pubDate') or fields.get('published') or fields.get('updated') or '',
+        'description': fields.get('description') or fields.get('summary') or fields.get('content') or ''
+    }
+
+def _drain_items(parser):
+    for _, element in parser.read_events():
+        if _local_name(element.tag) in ('item', 'entry'):
+            yield _normalize_item(element)
+            # Drop the parsed subtree so memory stays flat on large feeds
+            element.clear()
+
+ENTITY_PATTERN = re.compile(rb'&(?:(#[0-9]+|#x[0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);)?')
+XML_ENTITIES = {b'amp', b'lt', b'gt', b'quot', b'apos'}
+CDATA_START, CDATA_END = b'<![CDATA[', b']]>'
+
+def _fix_entity(match):
+    name = match.group(1)
+    if name is None:
+        # A bare '&' (e.g. "AT&T")
+        return b'&amp;'
+    if name.startswith(b'#') or name in XML_ENTITIES:
+        return match.group(0)
+    text = html.entities.html5.get(name.decode('ascii') + ';')
+    if text is None:
+        return b'&amp;' + name + b';'
+    return ''.join(f'&#{ord(ch)};' for ch in text).encode('ascii')
+
+class EntityFixer:
+    # expat stops at the first HTML entity (&nbsp;) or bare '&', dropping every later item,
+    # so those are rewritten as character references / &amp; before parsing. CDATA sections
+    # are left alone, and a tail that may be a split entity or CDATA marker is held back.
+    def __init__(self):
+        self.pending = b''
+        self.in_cdata = False
+
+    def feed(self, chunk, final=False):
+        data, self.pending = self.pending + chunk, b''
+        out, pos = [], 0
+        while pos < len(data):
+            if self.in_cdata:
+                end = data.find(CDATA_END, pos)
+                if end < 0:
+                    cut = len(data) if final else max(pos, len(data) - len(CDATA_END) + 1)
+                    out.append(data[pos:cut])
+                    self.pending = data[cut:]
+                    break
+                out.append(data[pos:end + len(CDATA_END)])
+                pos = end + len(CDATA_END)
+                self.in_cdata = False
+                continue
+            start = data.find(CDATA_START, pos)
+            if start >= 0:
+                out.append(ENTITY_PATTERN.sub(_fix_entity, data[pos:start]) + CDATA_START)
+                pos = start + len(CDATA_START)
+                self.in_cdata = True
+                continue
+            cut = len(data)
+            if not final:
+                amp = data.rfind(b'&', max(pos, cut - 32))
+                if amp >= 0 and b';' not in data[amp:]:
+                    cut = amp
+                lt = data.rfind(b'<', max(pos, len(data) - len(CDATA_START)))
+                if lt >= 0 and CDATA_START.startswith(data[lt:]):
+                    cut = min(cut, lt)
+            out.append(ENTITY_PATTERN.sub(_fix_entity, data[pos:cut]))
+            self.pending = data[cut:]
+            break
+        return b''.join(out)
+
+def iter_feed_items(chunks):
+    # Incrementally parses RSS <item> / Atom <entry> elements from byte chunks
+    parser = ET.XMLPullParser(events=('end',))
+    fixer = EntityFixer()
+    for chunk in chunks:
+        parser.feed(fixer.feed(chunk))
+        yield from _drain_items(parser)
+    parser.feed(fixer.feed(b'', final=True))
+    parser.close()
+    yield from _drain_items(parser)
@@ -0,0 +1,81 @@
+# filing_parser.py
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from edgar import Filing
+
+KEY_SECTIONS = ['Business', 'Risk Factors', 'Management’s Discussion and Analysis']
+SECTIONED_FORMS = ['10-K', '10-Q', 'S-1']
+
+def parse_filing(cik, company, form, filing_date, accession_no, max_chars):
+    # Runs in a worker process: rebuild the filing from its metadata and return plain text only
+    filing = Filing(cik=cik, company=company, form=form, filing_date=filing_date, accession_no=accession_no)
+    if form in SECTIONED_FORMS:
+        sections = filing.sections()
+        return {k: str(v)[:max_chars] for k, v in sections.items() if k in KEY_SECTIONS}
+    return {form: filing.full_text_submission()[:max_chars]}
+
+class FilingParserPool:
+    def __init__(self, max_workers=None, queue_size=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # Bounds filings in flight so a large backlog does not pile up in the pool's queue
+        self._slots = threading.BoundedSemaphore(queue_size or self.max_workers * 2)
+        self._executor_lock = threading.Lock()
+        # Built up front, before the pipeline, log and HTTP threads exist
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        # Workers start from a clean server process (or spawn), never by forking a
+        # process that already runs threads
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = self._new_executor()
+            return self._executor
+
+    def _submit(self, filing, max_chars):
+        self._slots.acquire()
+        try:
+            future = self._get_executor().submit(
+                parse_filing, filing.cik, filing.company, filing.form,
+                str(filing.filing_date), filing.accession_no, max_chars
+            )
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def parse_many(self, filings, max_chars):
+        # Returns {accession_no: sections}; failed filings are logged and left out
+        start = time.perf_counter()
+        futures = [(filing, self._submit(filing, max_chars)) for filing in filings]
+        results = {}
+        for filing, future in futures:
+            try:
+                results[filing.accession_no] = future.result()
+            except Exception as e:
+                logging.error(f"Error processing filing {filing.accession_no} ({filing.form}): {e}")
+
+        elapsed = time.perf_counter() - start
+        if filings:
+            total_chars = sum(len(text) for sections in results.values() for text in sections.values())
+            logging.info(
+                f"Parsed {len(results)}/{len(filings)} filings in {elapsed:.2f}s "
+                f"({len(filings) / elapsed if elapsed else 0:.1f} filings/s, {total_chars} chars kept)"
+            )
+        return results
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -0,0 +1,88 @@
+# fundamentals.py
+
+import logging
+import os
+import pickle
+import shutil
+import threading
+from datetime import date
+from pyfinmod.financials import Financials
+from utils import CACHE_DIR
+
+FUNDAMENTAL_FIELDS = ('cash_flow_statement', 'balance_sheet_statement', 'income_statement', 'mktCap', 'beta')
+PERIODIC_FORMS = ('10-K', '10-Q', '20-F')
+
+def current_period(today=None):
+    # Fallback generation when no periodic filing is known: the calendar quarter
+    today = today or date.today()
+    return f"{today.year}Q{(today.month - 1) // 3 + 1}"
+
+def filing_period(filings):
+    # Statements only change when a new 10-Q/10-K lands, so the latest periodic
+    # filing's accession number is the cache generation
+    periodic = [filing for filing in filings or [] if filing.form in PERIODIC_FORMS]
+    if not periodic:
+        return None
+    latest = max(periodic, key=lambda filing: str(filing.filing_date))
+    return latest.accession_no
+
+class Fundamentals:
+    def __init__(self, ticker, period, root):
+        self.ticker = ticker
+        self.period = period
+        self.path = os.path.join(root, ticker.upper(), period)
+        self._financials = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # Only called for fields not loaded yet; afterwards they are plain attributes
+        if name not in FUNDAMENTAL_FIELDS:
+            raise AttributeError(name)
+        with self._lock:
+            if name not in self.__dict__:
+                self.__dict__[name] = self._load(name)
+        return self.__dict__[name]
+
+    def _load(self, name):
+        file_path = os.path.join(self.path, f"{name}.pkl")
+        if os.path.exists(file_path):
+            with open(file_path, 'rb') as f:
+                return pickle.load(f)
+
+        if self._financials is None:
+            logging.info(f"Fetching fundamentals for {self.ticker} ({self.period})")
+            self._financials = Financials(self.ticker)
+        value = getattr(self._financials, name)
+
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f)
+        os.replace(tmp_path, file_path)
+        return value
+
+class FundamentalsCache:
+    def __init__(self, root=os.path.join(CACHE_DIR, 'fundamentals')):
+        self.root = root
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, ticker, period=None):
+        period = period or current_period()
+        key = (ticker.upper(), period)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._prune(ticker, period)
+                entry = Fundamentals(ticker, period, self.root)
+                self._entries[key] = entry
+        return entry
+
+    def _prune(self, ticker, period):
+        # Statements from earlier periods are superseded by the current one
+        ticker_dir = os.path.join(self.root, ticker.upper())
+        if not os.path.isdir(ticker_dir):
+            return
+        for name in os.listdir(ticker_dir):
+            if name != period:
+                shutil.rmtree(os.path.join(ticker_dir, name), ignore_errors=True)
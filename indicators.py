@@ -0,0 +1,134 @@
+# indicators.py
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# All functions take 2-D float arrays shaped (tickers, bars), oldest bar first.
+# Shorter histories are left-padded with NaN by stack_series.
+
+def stack_series(series_list):
+    length = max((len(s) for s in series_list), default=0)
+    out = np.full((len(series_list), length), np.nan)
+    for row, series in enumerate(series_list):
+        if len(series):
+            out[row, length - len(series):] = series
+    return out
+
+def rolling_mean(x, window):
+    out = np.full_like(x, np.nan)
+    if x.shape[1] >= window:
+        out[:, window - 1:] = sliding_window_view(x, window, axis=1).mean(axis=2)
+    return out
+
+def rolling_std(x, window):
+    out = np.full_like(x, np.nan)
+    if x.shape[1] >= window:
+        out[:, window - 1:] = sliding_window_view(x, window, axis=1).std(axis=2, ddof=0)
+    return out
+
+def ema(x, span=None, alpha=None):
+    alpha = alpha if alpha is not None else 2.0 / (span + 1.0)
+    out = np.empty_like(x)
+    prev = np.full(x.shape[0], np.nan)
+    # Recursive over time, vectorized across tickers; seeds on each row's first valid value
+    for t in range(x.shape[1]):
+        current = x[:, t]
+        prev = np.where(np.isnan(prev), current, np.where(np.isnan(current), prev, alpha * current + (1 - alpha) * prev))
+        out[:, t] = prev
+    return out
+
+def _diff(x):
+    out = np.full_like(x, np.nan)
+    out[:, 1:] = np.diff(x, axis=1)
+    return out
+
+def rsi(data, window=14):
+    change = _diff(data['close'])
+    gains = np.where(change > 0, change, np.where(np.isnan(change), np.nan, 0.0))
+    losses = np.where(change < 0, -change, np.where(np.isnan(change), np.nan, 0.0))
+    # Wilder smoothing
+    avg_gain = ema(gains, alpha=1.0 / window)
+    avg_loss = ema(losses, alpha=1.0 / window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        values = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + rs))
+    values[:, :window] = np.nan
+    return {'rsi': values}
+
+def macd(data, fast=12, slow=26, signal=9):
+    line = ema(data['close'], span=fast) - ema(data['close'], span=slow)
+    signal_line = ema(line, span=signal)
+    return {'macd': line, 'macd_signal': signal_line, 'macd_hist': line - signal_line}
+
+def atr(data, window=14):
+    high, low, close = data['high'], data['low'], data['close']
+    prev_close = np.full_like(close, np.nan)
+    prev_close[:, 1:] = close[:, :-1]
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    values = ema(true_range, alpha=1.0 / window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {'atr': values, 'atr_pct': values / close}
+
+def bollinger(data, window=20, num_std=2.0):
+    close = data['close']
+    mid = rolling_mean(close, window)
+    std = rolling_std(close, window)
+    upper = mid + num_std * std
+    lower = mid - num_std * std
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent_b = (close - lower) / (upper - lower)
+    return {'bb_mid': mid, 'bb_upper': upper, 'bb_lower': lower, 'bb_percent_b': percent_b}
+
+def volume_zscore(data, window=20):
+    volume = data['volume']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {'volume_zscore': (volume - rolling_mean(volume, window)) / rolling_std(volume, window)}
+
+def sma_trend(data, short=50, long=200):
+    close = data['close']
+    return {'sma_50': rolling_mean(close, short), 'sma_200': rolling_mean(close, long)}
+
+def returns(data, periods=(5, 20, 60)):
+    close = data['close']
+    result = {}
+    for period in periods:
+        values = np.full_like(close, np.nan)
+        if close.shape[1] > period:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values[:, period:] = close[:, period:] / close[:, :-period] - 1.0
+        result[f'return_{period}d'] = values
+    return result
+
+INDICATORS = {
+    'rsi': rsi,
+    'macd': macd,
+    'atr': atr,
+    'bollinger': bollinger,
+    'volume_zscore': volume_zscore,
+    'sma_trend': sma_trend,
+    'returns': returns,
+}
+
+DEFAULT_INDICATORS = ['rsi', 'macd', 'atr', 'bollinger', 'volume_zscore', 'sma_trend', 'returns']
+
+def compute_indicators(data, names=DEFAULT_INDICATORS):
+    # data: {'close', 'high', 'low', 'volume'} -> 2-D arrays of equal shape
+    results = {}
+    for name in names:
+        results.update(INDICATORS[name](data))
+    return results
+
+def latest_values(results, close=None):
+    # Last valid value of every indicator per ticker row, as plain floats
+    summaries = []
+    rows = next(iter(results.values())).shape[0] if results else 0
+    for row in range(rows):
+        summary = {}
+        if close is not None:
+            valid = close[row][~np.isnan(close[row])]
+            summary['close'] = float(valid[-1]) if len(valid) else None
+        for name, values in results.items():
+            valid = values[row][~np.isnan(values[row])]
+            summary[name] = round(float(valid[-1]), 4) if len(valid) else None
+        summaries.append(summary)
+    return summaries
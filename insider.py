@@ -0,0 +1,68 @@
+# insider.py
+
+import numpy as np
+import pandas as pd
+
+WINDOWS = (30, 90, 180)
+CLUSTER_WINDOW_DAYS = 30
+CLUSTER_MIN_INSIDERS = 3
+
+def _signed_trades(insider_trades):
+    text_column = 'Text' if 'Text' in insider_trades.columns else 'Transaction'
+    text = insider_trades[text_column].fillna('').astype(str).str.lower()
+    # Open-market purchases and sales only; grants, awards and option exercises are ignored
+    direction = np.where(text.str.contains('purchase|bought'), 1, np.where(text.str.contains('sale|sold'), -1, 0))
+    trades = pd.DataFrame({
+        'date': pd.to_datetime(insider_trades.get('Start Date'), errors='coerce'),
+        'insider': insider_trades.get('Insider', pd.Series('', index=insider_trades.index)).fillna('').astype(str),
+        'direction': direction,
+        'shares': pd.to_numeric(insider_trades.get('Shares'), errors='coerce').fillna(0).abs().to_numpy(),
+        'value': pd.to_numeric(insider_trades.get('Value'), errors='coerce').fillna(0).abs().to_numpy()
+    })
+    return trades[(trades['direction'] != 0) & trades['date'].notna()]
+
+def detect_cluster_buy(trades, as_of, window_days=CLUSTER_WINDOW_DAYS, min_insiders=CLUSTER_MIN_INSIDERS, lookback_days=max(WINDOWS)):
+    # Largest number of distinct insiders buying inside any window_days span of the lookback
+    buys = trades[(trades['direction'] > 0) & (trades['date'] >= as_of - pd.Timedelta(days=lookback_days))].sort_values('date')
+    if buys.empty:
+        return {'cluster_buy': False, 'max_insiders_buying_in_window': 0}
+    dates = buys['date'].to_numpy()
+    insiders = buys['insider'].to_numpy()
+    starts = np.searchsorted(dates, dates - np.timedelta64(window_days, 'D'), side='left')
+    best = max(len(set(insiders[start:end + 1])) for end, start in enumerate(starts))
+    return {'cluster_buy': bool(best >= min_insiders), 'max_insiders_buying_in_window': int(best)}
+
+def aggregate_insider_trades(insider_trades, as_of=None, windows=WINDOWS, top_insiders=5):
+    if insider_trades is None or getattr(insider_trades, 'empty', True):
+        return {'transactions': 0}
+    trades = _signed_trades(insider_trades)
+    as_of = pd.Timestamp(as_of or pd.Timestamp.today().normalize())
+    if getattr(trades['date'].dt, 'tz', None) is not None:
+        trades = trades.assign(date=trades['date'].dt.tz_localize(None))
+
+    features = {'transactions': int(len(insider_trades))}
+    signed_shares = trades['direction'] * trades['shares']
+    signed_value = trades['direction'] * trades['value']
+    age_days = (as_of - trades['date']).dt.days.to_numpy()
+    for window in windows:
+        in_window = (age_days >= 0) & (age_days <= window)
+        features[f'{window}d'] = {
+            'buys': int(((trades['direction'] > 0) & in_window).sum()),
+            'sells': int(((trades['direction'] < 0) & in_window).sum()),
+            'net_shares': float(signed_shares[in_window].sum()),
+            'net_value': float(signed_value[in_window].sum())
+        }
+
+    longest = (age_days >= 0) & (age_days <= max(windows))
+    per_insider = pd.DataFrame({
+        'insider': trades['insider'][longest],
+        'net_shares': signed_shares[longest],
+        'net_value': signed_value[longest]
+    }).groupby('insider').sum()
+    top = per_insider.reindex(per_insider['net_value'].abs().sort_values(ascending=False).index).head(top_insiders)
+    features['top_insiders'] = [
+        {'insider': name, 'net_shares': float(row['net_shares']), 'net_value': float(row['net_value'])}
+        for name, row in top.iterrows()
+    ]
+    features.update(detect_cluster_buy(trades, as_of))
+    return features
@@ -0,0 +1,183 @@
+# llm_client.py
+
+import logging
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from llm_cache import LLMResponseCache
+from structured import parse_structured, StructuredOutputError
+import rate_limiter
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+class LLMError(Exception):
+    pass
+
+class OpenRouterClient:
+    def __init__(self, api_key, timeout=60, max_retries=5, pool_size=10, cache=None, max_backoff=60):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.cache = cache
+        # Skip cache reads (fresh responses are still written back)
+        self.bypass_cache = False
+
+        # One keep-alive session for every LLM call so TLS connections are reused
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+
+        self._stats_lock = threading.Lock()
+        self.stats = {}
+
+    def chat(self, model, messages, timeout=None, bypass_cache=False, **params):
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(model, messages, params)
+            if not (bypass_cache or self.bypass_cache):
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    self._record(model, 0.0, None, cached=True)
+                    return cached
+
+        data = {"model": model, "messages": messages}
+        data.update(params)
+
+        # Every call takes a token from the host bucket, which caps combined OpenRouter
+        # traffic, and from its model's bucket, which caps that model alone
+        host_bucket = rate_limiter.get_bucket("openrouter")
+        bucket = rate_limiter.get_bucket(f"openrouter:{model}")
+        for attempt in range(self.max_retries):
+            host_bucket.acquire()
+            bucket.acquire()
+            start = time.perf_counter()
+            server_wait = None
+            try:
+                response = self.session.post(
+                    url=OPENROUTER_URL,
+                    json=data,
+                    timeout=timeout or self.timeout
+                )
+                # Rate-limit headers describe the account, so they pause every model
+                server_wait = host_bucket.update_from_headers(response.headers)
+                response.raise_for_status()
+                result = response.json()
+                content = result['choices'][0]['message']['content'].strip()
+            except (requests.exceptions.RequestException, KeyError, IndexError, TypeError, ValueError) as e:
+                self._record(model, time.perf_counter() - start, None, failed=True)
+                logging.error(f"Error in OpenRouter request ({model}): {str(e)}")
+                status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+                if status_code is not None:
+                    logging.error(f"Status code: {status_code}")
+                    logging.error(f"Error message: {e.response.text}")
+
+                if attempt == self.max_retries - 1:
+                    raise LLMError(f"OpenRouter request failed after {self.max_retries} attempts: {e}") from e
+
+                wait_time = self._backoff(attempt, status_code, bucket, server_wait)
+                if wait_time:
+                    time.sleep(wait_time)
+                continue
+
+            latency = time.perf_counter() - start
+            self._record(model, latency, result.get('usage'))
+            logging.debug(f"OpenRouter call to {model} took {latency:.2f}s")
+            if cache_key is not None:
+                self.cache.put(cache_key, model, content)
+            return content
+
+        raise LLMError("OpenRouter request failed")
+
+    def chat_structured(self, model, messages, schema, repair_attempts=1, **params):
+        # JSON-mode request validated against a pydantic model. An invalid reply gets up to
+        # repair_attempts follow-up turns quoting the error, for this request only.
+        params.setdefault('response_format', {'type': 'json_object'})
+        for attempt in range(repair_attempts + 1):
+            content = self.chat(model, messages, **params)
+            try:
+                return parse_structured(content, schema)
+            except StructuredOutputError as e:
+                if attempt == repair_attempts:
+                    raise LLMError(f"Invalid {schema.__name__} response from {model}: {e}") from e
+                logging.warning(f"Invalid {schema.__name__} response from {model}, asking for a repair: {e}")
+                messages = messages + [
+                    {"role": "assistant", "content": content},
+                    {"role": "user", "content": f"That response was not valid: {e}\nReply with only the corrected JSON object."}
+                ]
+
+    def _backoff(self, attempt, status_code, bucket, server_wait):
+        # Capped exponential backoff with jitter
+        wait_time = min(self.max_backoff, 2 ** attempt) * (0.5 + random.random() / 2)
+        if status_code == 429:
+            # A Retry-After / rate-limit header has already paused the host bucket; without one,
+            # pause it ourselves so every caller of this model backs off, not just this one
+            if not server_wait:
+                bucket.pause(wait_time)
+            logging.warning(f"Rate limit exceeded for {bucket.name}, backing off")
+            return 0
+        return wait_time
+
+    def _record(self, model, latency, usage, failed=False, cached=False):
+        with self._stats_lock:
+            stats = self.stats.setdefault(model, {
+                'calls': 0,
+                'cache_hits': 0,
+                'failures': 0,
+                'latency': 0.0,
+                'prompt_tokens': 0,
+                'completion_tokens': 0
+            })
+            if cached:
+                stats['cache_hits'] += 1
+                return
+            stats['calls'] += 1
+            stats['latency'] += latency
+            if failed:
+                stats['failures'] += 1
+            if usage:
+                stats['prompt_tokens'] += usage.get('prompt_tokens') or 0
+                stats['completion_tokens'] += usage.get('completion_tokens') or 0
+
+    def log_stats(self):
+        with self._stats_lock:
+            for model, stats in self.stats.items():
+                avg_latency = stats['latency'] / stats['calls'] if stats['calls'] else 0.0
+                logging.info(
+                    f"LLM usage for {model}: {stats['calls']} calls ({stats['failures']} failed), "
+                    f"{stats['cache_hits']} cache hits, "
+                    f"avg latency {avg_latency:.2f}s, "
+                    f"{stats['prompt_tokens']} prompt / {stats['completion_tokens']} completion tokens"
+                )
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(config):
+    # Shared client per API key so every module draws from the same connection pool
+    with _clients_lock:
+        client = _clients.get(config.OPENROUTER_API_KEY)
+        if client is None:
+            rate_limiter.configure(config)
+            cache = None
+            if getattr(config, 'LLM_CACHE_ENABLED', True):
+                cache = LLMResponseCache(
+                    ttl=getattr(config, 'LLM_CACHE_TTL', 7 * 24 * 3600),
+                    max_entries=getattr(config, 'LLM_CACHE_MAX_ENTRIES', 20000)
+                )
+            client = OpenRouterClient(
+                config.OPENROUTER_API_KEY,
+                timeout=getattr(config, 'OPENROUTER_TIMEOUT', 60),
+                max_retries=getattr(config, 'OPENROUTER_MAX_RETRIES', 5),
+                pool_size=getattr(config, 'OPENROUTER_POOL_SIZE', 10),
+                cache=cache,
+                max_backoff=getattr(config, 'OPENROUTER_MAX_BACKOFF', 60)
+            )
+            _clients[config.OPENROUTER_API_KEY] = client
+        return client
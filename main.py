@@ -2,277 +2,74 @@
 
 import schedule
 import logging
-import time
 import config
-from utils import setup_logging, send_email, rate_limit
+import fcntl
+import signal
+import threading
+from utils import send_email, CACHE_DIR
+from run_log import setup_run_logging, stop_run_logging, set_run_id
 from data_processing import DataProcessor
 from analysis import Analyzer
 from recommendations import Recommender
-import requests
-import json
+from llm_client import get_client
+from pipeline import Pipeline, ARTICLE_STAGES, build_prefilter
+from run_journal import RunJournal
+from feeds import article_key
+from ticker_resolver import get_ticker_index
+from entity_cache import get_entity_cache
+import rate_limiter
+import asyncio
 import argparse
 from tests import run_all_tests
 import os
 from dotenv import load_dotenv
-import sys
 from datetime import datetime
 
-@rate_limit(5)
-def is_special_situation(article_content, config):
-    logging.info("Checking if article describes a special situation")
-    prompt = f"""
-    Analyze the following article content and determine if it describes any of the following:
-
-    - A corporate action (e.g., merger, acquisition, spinoff, rights offering)
-    - A special situation or workout
-    - A clear catalyst for short-term price movement
-
-    Provide a JSON object with a single key "is_special_situation" and a boolean value (true or false). Do not include any additional text.
-
-    Content: {article_content}
-
-    Example output format:
-    {{"is_special_situation": true}}
-    """
-    headers = {
-        "Authorization": f"Bearer {config.OPENROUTER_API_KEY}"
-    }
-    data = {
-        "model": config.FAST_LLM,
-        "messages": [
-            {"role": "system", "content": "You are a helpful assistant that analyzes text and determines if it describes a special situation, returning a JSON object."},
-            {"role": "user", "content": prompt}
-        ]
-    }
-
-    max_retries = 5
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(
-                url="https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=60
-            )
-            response.raise_for_status()
-
-            result = response.json()
-            response_text = result['choices'][0]['message']['content'].strip()
-            logging.debug(f"LLM response: {response_text}")
-
-            # Parse the JSON response
-            try:
-                response_json = json.loads(response_text)
-            except json.JSONDecodeError:
-                logging.error(f"Failed to parse JSON from LLM response: {response_text}")
-                return False
-
-            if not isinstance(response_json, dict) or "is_special_situation" not in response_json:
-                logging.error(f"Unexpected response format: {response_json}")
-                return False
-
-            return response_json["is_special_situation"]
-
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error in API request: {str(e)}")
-            if hasattr(e, 'response'):
-                logging.error(f"Status code: {e.response.status_code}")
-                logging.error(f"Error message: {e.response.text}")
-            
-            if isinstance(e, requests.exceptions.HTTPError) and e.response.status_code == 429:
-                wait_time = 60 * (2 ** attempt)  # Start with 60 seconds, then double each time
-                logging.warning(f"Rate limit exceeded. Waiting for {wait_time} seconds before retrying...")
-                time.sleep(wait_time)
-            elif attempt == max_retries - 1:
-                logging.error(f"Error determining special situation after {max_retries} attempts")
-                return False
-            else:
-                time.sleep(2 ** attempt)  # Exponential backoff for other errors
-
-    return False
-
-@rate_limit(5)
-def extract_tickers(article_content, config):
-    logging.info("Extracting tickers from article content")
-    prompt = f"""
-    Extract all company names mentioned in the following article content.
-    Provide the output as a JSON array of strings, where each string is a company name.
-    Only include the JSON array in your response, with no additional text.
-
-    Content: {article_content}
-
-    Example output format:
-    ["Apple Inc.", "Microsoft Corporation", "Amazon.com, Inc."]
-    """
-    headers = {
-        "Authorization": f"Bearer {config.OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "model": config.FAST_LLM,
-        "messages": [
-            {"role": "system", "content": "You are a helpful assistant that extracts company names from text and returns them in a JSON array format."},
-            {"role": "user", "content": prompt}
-        ]
-    }
-    
-    max_retries = 5
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(
-                url="https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=60
-            )
-            response.raise_for_status()
-            
-            result = response.json()
-            company_names_json = result['choices'][0]['message']['content'].strip()
-            logging.debug(f"LLM response: {company_names_json}")
-            
-            # Parse the JSON response
-            try:
-                company_list = json.loads(company_names_json)
-            except json.JSONDecodeError:
-                logging.error(f"Failed to parse JSON from LLM response: {company_names_json}")
-                return []
-            
-            if not isinstance(company_list, list):
-                logging.error(f"Expected a JSON array of company names, got: {type(company_list)}")
-                return []
-            
-            tickers = []
-            for company_name in company_list:
-                ticker = get_ticker(company_name)
-                if ticker:
-                    tickers.append(ticker)
-            logging.info(f"Extracted tickers: {tickers}")
-            return tickers
-        
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error in API request: {str(e)}")
-            if hasattr(e, 'response'):
-                logging.error(f"Status code: {e.response.status_code}")
-                logging.error(f"Error message: {e.response.text}")
-            
-            if isinstance(e, requests.exceptions.HTTPError) and e.response.status_code == 429:
-                wait_time = 60 * (2 ** attempt)  # Start with 60 seconds, then double each time
-                logging.warning(f"Rate limit exceeded. Waiting for {wait_time} seconds before retrying...")
-                time.sleep(wait_time)
-            elif attempt == max_retries - 1:
-                logging.error(f"Error extracting company names after {max_retries} attempts")
-                return []
-            else:
-                time.sleep(2 ** attempt)  # Exponential backoff for other errors
-    
-    return []
-
-def get_ticker(company_name):
-    yfinance_url = "https://query2.finance.yahoo.com/v1/finance/search"
-    user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
-    params = {"q": company_name, "quotes_count": 1, "country": "United States"}
-
-    res = requests.get(url=yfinance_url, params=params, headers={'User-Agent': user_agent})
-    data = res.json()
+def run_lock(path=os.path.join(CACHE_DIR, 'run.lock')):
+    # Non-blocking exclusive lock so a scheduled cycle never overlaps a manual run
+    # (or another daemon); returns the open lock file, or None if a run is in progress
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock_file = open(path, 'w')
     try:
-        company_code = data['quotes'][0]['symbol']
-        return company_code
-    except (IndexError, KeyError):
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
         return None
+    return lock_file
 
-class OutputRedirector:
-    def __init__(self, original_stream, log_file):
-        self.original_stream = original_stream
-        self.log_file = log_file
-
-    def write(self, text):
-        self.original_stream.write(text)
-        with open(self.log_file, 'a') as f:
-            f.write(text)
-
-    def flush(self):
-        self.original_stream.flush()
-
-def main():
-    # Set up output redirection
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_file = f"output_{timestamp}.txt"
-    sys.stdout = OutputRedirector(sys.stdout, log_file)
-    sys.stderr = OutputRedirector(sys.stderr, log_file)
-
+def check_environment():
     load_dotenv()  # Load environment variables
-    setup_logging()
-    logging.info("Starting main process")
 
     # Check for required environment variables
     required_env_vars = ['OPENROUTER_API_KEY', 'EXA_API_KEY', 'FAST_LLM', 'SMART_LLM']
     for var in required_env_vars:
         if not os.getenv(var):
             logging.error(f"Missing required environment variable: {var}")
-            return
+            return False
+    return True
+
+def build_components(bypass_llm_cache=False):
+    get_client(config).bypass_cache = bypass_llm_cache
+    # The prefilter trains on every stored label, so it is built once alongside the other components
+    prefilter = build_prefilter(config) if 'prefilter' in getattr(config, 'FUNNEL_ARTICLE_STAGES', ARTICLE_STAGES) else None
+    return DataProcessor(config), Analyzer(config), Recommender(config), prefilter
+
+def process_articles(articles, data_processor, analyzer, recommender, prefilter, journal, concurrency=1):
+    # Process each article
+    pipeline = Pipeline(config, data_processor, analyzer, journal, prefilter)
+    if concurrency > 1:
+        analysis_results = asyncio.run(pipeline.run_async(articles, concurrency))
+    else:
+        analysis_results = pipeline.run(articles)
 
-    try:
-        data_processor = DataProcessor(config)
-        analyzer = Analyzer(config)
-        recommender = Recommender(config)
-
-        # Fetch RSS feeds
-        articles = data_processor.fetch_rss_articles(config.RSS_FEEDS)
-        logging.info(f"Fetched {len(articles)} articles from RSS feeds")
-
-        # Process each article
-        analysis_results = []
-        for i, article in enumerate(articles):
-            logging.info(f"Processing article {i+1}/{len(articles)}")
-            try:
-                # Extract tickers or relevant companies from the article
-                tickers = extract_tickers(article['description'], config)
-                logging.debug(f"Extracted tickers: {tickers}")
-
-                if not tickers:
-                    logging.info("No tickers found in article, skipping")
-                    continue
-
-                for ticker in tickers:
-                    try:
-                        stock_data = data_processor.get_stock_data(ticker)
-                        # Check if market cap is under $500 million
-                        market_cap = stock_data.info.get('marketCap')
-                        if market_cap is None:
-                            logging.warning(f"Market cap data missing for {ticker}, skipping")
-                            continue
-                        if market_cap < 500_000_000:
-                            # Determine if it's a special situation or obvious price catalyst
-                            if is_special_situation(article['description'], config):
-                                # Proceed with analysis
-                                financials = data_processor.get_financials(ticker)
-                                sec_filings = data_processor.get_sec_filings(ticker)
-
-                                # Perform analysis
-                                sec_analysis = analyzer.analyze_sec_filings(sec_filings)
-                                dcf_value = analyzer.perform_dcf_analysis(financials)
-                                tech_analysis = analyzer.perform_technical_analysis(stock_data)
-                                insider_trades = analyzer.analyze_insider_trading(ticker)
-
-                                # Summarize findings
-                                findings_text = f"SEC Analysis: {sec_analysis}\nDCF Value: {dcf_value}\nTechnical Analysis: {tech_analysis}\nInsider Trades: {insider_trades}"
-                                findings = analyzer.summarize_findings(findings_text)
-                                analysis_results.append(findings)
-                                logging.info(f"Completed analysis for {ticker}")
-                            else:
-                                logging.info(f"Ticker {ticker} did not meet the special situation criteria")
-                        else:
-                            logging.info(f"Ticker {ticker} has market cap over $500 million, skipping")
-                    except Exception as e:
-                        logging.error(f"Error processing ticker {ticker}: {str(e)}")
-            except Exception as e:
-                logging.error(f"Error processing article: {str(e)}")
-
-        if not analysis_results:
-            logging.warning("No analysis results to process")
-            return
+    if not analysis_results:
+        logging.warning("No analysis results to process")
+        return
 
+    if getattr(config, 'RECOMMENDER_MERGED', False):
+        # Generate and score each recommendation in a single call
+        scored_recommendations = recommender.generate_and_score(analysis_results)
+    else:
         # Generate recommendations
         recommendations = recommender.generate_trade_recommendations(analysis_results)
 
@@ -283,22 +80,163 @@ def main():
         # Score recommendations
         scored_recommendations = recommender.score_recommendations(recommendations)
 
-        # Prepare email body
-        email_body = '\n\n'.join([f"Recommendation:\n{rec['recommendation']}\nScore:\n{rec['score']}" for rec in scored_recommendations])
+    if not scored_recommendations:
+        logging.warning("No recommendations scored above the threshold")
+        return
+
+    # Prepare email body
+    email_body = '\n\n'.join([f"Recommendation:\n{rec['recommendation']}\nScore:\n{rec['score']:g}/10\n{rec['justification']}" for rec in scored_recommendations])
+
+    # Save to CSV instead of sending email
+    send_email("Daily Trade Recommendations", email_body, config)
+    logging.info("Process completed successfully")
+
+def finish_articles(articles, data_processor, journal):
+    # Articles whose article stages failed (e.g. during an OpenRouter outage) stay new so the
+    # next fetch retries them; daemon cycles get fresh run ids, so no resume would pick them up
+    failed = journal.failed_items(getattr(config, 'FUNNEL_ARTICLE_STAGES', ARTICLE_STAGES))
+    retry = [article for article in articles if article_key(article) in failed]
+    if retry:
+        logging.warning(f"{len(retry)} articles failed an article stage and will be fetched again")
+    data_processor.mark_processed(articles, retry)
+
+def log_stats():
+    get_client(config).log_stats()
+    get_ticker_index().log_stats()
+    get_entity_cache().log_stats()
+    rate_limiter.log_stats()
+
+def main(concurrency=1, bypass_llm_cache=False, resume_run_id=None, retry_ticker=None):
+    listener = setup_run_logging(config)
+    try:
+        run(concurrency, bypass_llm_cache, resume_run_id, retry_ticker)
+    finally:
+        stop_run_logging(listener)
+
+def run(concurrency=1, bypass_llm_cache=False, resume_run_id=None, retry_ticker=None):
+    run_id = resume_run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+    set_run_id(run_id)
+    if not check_environment():
+        return
+    logging.info("Starting main process")
 
-        # Save to CSV instead of sending email
-        send_email("Daily Trade Recommendations", email_body, config)
-        logging.info("Process completed successfully")
+    # A ticker retry keeps earlier failures of other tickers instead of retrying them too
+    journal = RunJournal(run_id, replay_failures=retry_ticker is not None)
+    lock_file = run_lock()
+    if lock_file is None:
+        logging.error("Another run is in progress; exiting")
+        return
+    try:
+        data_processor, analyzer, recommender, prefilter = build_components(bypass_llm_cache)
+
+        if resume_run_id:
+            articles = journal.load_articles()
+            logging.info(f"Resuming run {run_id} with {len(articles)} journaled articles")
+            if retry_ticker:
+                journal.clear_ticker(retry_ticker)
+        else:
+            # Fetch RSS feeds
+            articles = data_processor.fetch_rss_articles(config.RSS_FEEDS)
+            logging.info(f"Fetched {len(articles)} articles from RSS feeds (run id {run_id})")
+            journal.start_run(articles)
+
+        process_articles(articles, data_processor, analyzer, recommender, prefilter, journal, concurrency)
+        finish_articles(articles, data_processor, journal)
 
     except Exception as e:
         logging.exception("An unexpected error occurred in the main process")
+    finally:
+        lock_file.close()
+        log_stats()
+        journal.log_stats()
+
+def daemon(concurrency=1, bypass_llm_cache=False, interval=None):
+    listener = setup_run_logging(config)
+    try:
+        run_daemon(concurrency, bypass_llm_cache, interval)
+    finally:
+        stop_run_logging(listener)
+
+def run_daemon(concurrency=1, bypass_llm_cache=False, interval=None):
+    # Keeps clients, connection pools and in-memory caches alive between cycles and
+    # only processes articles the feeds have not emitted before
+    if not check_environment():
+        return
+    interval = interval or getattr(config, 'DAEMON_POLL_INTERVAL', 900)
+    logging.info(f"Starting daemon, polling feeds every {interval}s")
+    data_processor, analyzer, recommender, prefilter = build_components(bypass_llm_cache)
+
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        logging.info(f"Received signal {signum}, shutting down after the current cycle")
+        stop.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    def cycle():
+        if stop.is_set():
+            return
+        lock_file = run_lock()
+        if lock_file is None:
+            logging.warning("Previous run still in progress; skipping this cycle")
+            return
+        journal = None
+        try:
+            articles = data_processor.fetch_rss_articles(config.RSS_FEEDS)
+            if not articles:
+                logging.info("No new articles")
+                data_processor.mark_processed(articles)
+                return
+            journal = RunJournal(datetime.now().strftime("%Y%m%d_%H%M%S"))
+            set_run_id(journal.run_id)
+            journal.start_run(articles)
+            logging.info(f"Processing {len(articles)} new articles (run id {journal.run_id})")
+            process_articles(articles, data_processor, analyzer, recommender, prefilter, journal, concurrency)
+            finish_articles(articles, data_processor, journal)
+        except Exception:
+            logging.exception("An unexpected error occurred in a daemon cycle")
+        finally:
+            lock_file.close()
+            if journal is not None:
+                journal.log_stats()
+
+    schedule.every(interval).seconds.do(cycle)
+    cycle()
+    while not stop.is_set():
+        schedule.run_pending()
+        stop.wait(1)
+
+    schedule.clear()
+    analyzer.filing_parser.shutdown()
+    log_stats()
+    logging.info("Daemon stopped")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run the main program or tests")
     parser.add_argument("--test", action="store_true", help="Run tests instead of the main program")
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of concurrent workers per pipeline stage (1 runs sequentially)")
+    parser.add_argument("--no-llm-cache", action="store_true", help="Ignore cached LLM responses and query OpenRouter again")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Resume a previous run, skipping stages already journaled")
+    parser.add_argument("--retry-ticker", metavar="TICKER", help="With --resume, recompute only this ticker's stages")
+    parser.add_argument("--daemon", action="store_true", help="Keep running and poll feeds for new articles on an interval")
+    parser.add_argument("--interval", type=int, help="Seconds between feed polls in --daemon mode (default: config.DAEMON_POLL_INTERVAL or 900)")
     args = parser.parse_args()
 
+    if args.retry_ticker and not args.resume:
+        parser.error("--retry-ticker requires --resume")
+    if args.daemon and args.resume:
+        parser.error("--daemon cannot be combined with --resume")
+
     if args.test:
         run_all_tests()
+    elif args.daemon:
+        daemon(concurrency=args.concurrency, bypass_llm_cache=args.no_llm_cache, interval=args.interval)
     else:
-        main()
\ No newline at end of file
+        main(
+            concurrency=args.concurrency,
+            bypass_llm_cache=args.no_llm_cache,
+            resume_run_id=args.resume,
+            retry_ticker=args.retry_ticker
+        )
\ No newline at end of file
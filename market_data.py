@@ -0,0 +1,110 @@
+# market_data.py
+
+import logging
+import threading
+import time
+import requests
+import yfinance as yf
+import rate_limiter
+
+YAHOO_QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"
+YAHOO_CRUMB_URL = "https://query1.finance.yahoo.com/v1/test/getcrumb"
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
+
+class QuoteSnapshot:
+    def __init__(self, ttl=300, chunk_size=50, timeout=15):
+        self.ttl = ttl
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        self._crumb = None
+        self._crumb_lock = threading.Lock()
+        self._quotes = {}
+        self._lock = threading.Lock()
+
+    def get(self, tickers):
+        # Returns {ticker: {'market_cap', 'price', 'volume'}} from one bulk fetch per chunk
+        now = time.time()
+        with self._lock:
+            fresh = {t: q for t, (fetched_at, q) in self._quotes.items() if now - fetched_at < self.ttl}
+        missing = [t for t in dict.fromkeys(tickers) if t not in fresh]
+
+        for i in range(0, len(missing), self.chunk_size):
+            chunk = missing[i:i + self.chunk_size]
+            try:
+                quotes = self._fetch_bulk(chunk)
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                logging.warning(f"Bulk quote fetch failed ({str(e)}), falling back to per-ticker fast_info")
+                quotes = {}
+            for ticker in chunk:
+                if ticker not in quotes:
+                    quotes[ticker] = self._fetch_fast_info(ticker)
+            with self._lock:
+                for ticker, quote in quotes.items():
+                    self._quotes[ticker] = (now, quote)
+            fresh.update(quotes)
+
+        logging.debug(f"Quote snapshot: {len(tickers) - len(missing)} cached, {len(missing)} fetched")
+        return {t: fresh[t] for t in tickers if t in fresh}
+
+    def _ensure_crumb(self):
+        # One thread fetches the crumb while concurrent callers wait for it
+        with self._crumb_lock:
+            if self._crumb is None:
+                # Yahoo hands out the session cookie on any page, then a crumb tied to it
+                self.session.get("https://fc.yahoo.com", timeout=self.timeout)
+                response = self.session.get(YAHOO_CRUMB_URL, timeout=self.timeout)
+                response.raise_for_status()
+                self._crumb = response.text.strip()
+            return self._crumb
+
+    def _invalidate_crumb(self, crumb):
+        # Only the crumb that was rejected; another thread may already hold a fresh one
+        with self._crumb_lock:
+            if self._crumb == crumb:
+                self._crumb = None
+
+    def _fetch_bulk(self, symbols):
+        bucket = rate_limiter.get_bucket('yahoo')
+        for attempt in range(2):
+            crumb = self._ensure_crumb()
+            params = {
+                'symbols': ','.join(symbols),
+                'fields': 'marketCap,regularMarketPrice,regularMarketVolume',
+                'crumb': crumb
+            }
+            bucket.acquire()
+            start = time.perf_counter()
+            response = self.session.get(YAHOO_QUOTE_URL, params=params, timeout=self.timeout)
+            bucket.update_from_headers(response.headers)
+            if response.status_code in (401, 403):
+                # Yahoo expires crumbs; without a refresh every later bulk call would fail
+                self._invalidate_crumb(crumb)
+                if attempt == 0:
+                    logging.info(f"Yahoo rejected the crumb ({response.status_code}), fetching a new one")
+                    continue
+            break
+        response.raise_for_status()
+        results = response.json()['quoteResponse']['result']
+        logging.debug(f"Fetched {len(results)} quotes in {time.perf_counter() - start:.2f}s")
+        return {
+            quote['symbol']: {
+                'market_cap': quote.get('marketCap'),
+                'price': quote.get('regularMarketPrice'),
+                'volume': quote.get('regularMarketVolume')
+            }
+            for quote in results
+        }
+
+    def _fetch_fast_info(self, ticker):
+        try:
+            info = yf.Ticker(ticker).fast_info
+            return {
+                'market_cap': info.get('marketCap'),
+                'price': info.get('lastPrice'),
+                'volume': info.get('lastVolume')
+            }
+        except Exception as e:
+            logging.error(f"Error fetching quote for {ticker}: {str(e)}")
+            return {'market_cap': None, 'price': None, 'volume': None}
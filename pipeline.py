@@ -0,0 +1,444 @@
+# pipeline.py
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from digest import build_digest, format_digest
+from feeds import article_key
+from prefilter import ArticlePrefilter, article_text
+from run_log import stage_context
+from screening import (
+    is_special_situation, extract_company_names, resolve_names, resolve_tickers,
+    plan_batches, classify_articles_batch, extract_company_names_batch
+)
+
+# Cheapest-first: one classification call per article gates ticker extraction
+# and every Yahoo lookup behind it
+ARTICLE_STAGES = ['prefilter', 'classify', 'extract']
+TICKER_STAGES = ['market_cap']
+
+# Article stages that can be answered for many articles in one LLM request,
+# mapped to the context field their batch result is stored under
+BATCHED_STAGES = {
+    'classify': ('is_special_situation', classify_articles_batch),
+    'extract': ('company_names', extract_company_names_batch),
+}
+
+# Context fields a stage produces that downstream stages need, journaled with its result
+STAGE_FIELDS = {
+    'extract': ['tickers'],
+    'market_cap': ['quote'],
+}
+
+def build_prefilter(config):
+    return ArticlePrefilter(
+        threshold=getattr(config, 'PREFILTER_THRESHOLD', 0.3),
+        sample_rate=getattr(config, 'PREFILTER_SAMPLE_RATE', 0.05),
+        min_labels=getattr(config, 'PREFILTER_MIN_LABELS', 50)
+    )
+
+class FunnelStage:
+    def __init__(self, name, check, journal=None):
+        self.name = name
+        self.check = check
+        self.journal = journal
+        self.passed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, context):
+        with stage_context(self.name):
+            return self._run(context)
+
+    def _run(self, context):
+        journaled = self.journal.get(context['key'], self.name) if self.journal else None
+        if journaled is not None:
+            status, saved = journaled
+            # Journaled failures only replay with replay_failures set, and stay failed
+            result = status == 'ok' and saved['passed']
+            if result:
+                context.update(saved['fields'])
+        else:
+            try:
+                result = bool(self.check(context))
+            except Exception as e:
+                if self.journal:
+                    self.journal.record(context['key'], self.name, str(e), status='failed')
+                raise
+            if self.journal:
+                fields = {field: context.get(field) for field in STAGE_FIELDS.get(self.name, [])}
+                self.journal.record(context['key'], self.name, {'passed': result, 'fields': fields})
+        with self._lock:
+            if result:
+                self.passed += 1
+            else:
+                self.failed += 1
+        return result
+
+class Pipeline:
+    def __init__(self, config, data_processor, analyzer, journal=None, prefilter=None):
+        self.config = config
+        self.data_processor = data_processor
+        self.analyzer = analyzer
+        self.journal = journal
+        # Run-wide name -> ticker memo, so each distinct company name is resolved once per run
+        self.resolved_names = {}
+
+        checks = {
+            'prefilter': self._check_prefilter,
+            'classify': self._check_special_situation,
+            'extract': self._check_tickers,
+            'market_cap': self._check_market_cap,
+        }
+        self.article_stages = [FunnelStage(name, checks[name], journal) for name in getattr(config, 'FUNNEL_ARTICLE_STAGES', ARTICLE_STAGES)]
+        self.ticker_stages = [FunnelStage(name, checks[name], journal) for name in getattr(config, 'FUNNEL_TICKER_STAGES', TICKER_STAGES)]
+
+        # Long-lived callers (the daemon) pass one prefilter in so it is trained once
+        self.prefilter = None
+        if any(stage.name == 'prefilter' for stage in self.article_stages):
+            self.prefilter = prefilter or build_prefilter(config)
+
+    def _check_prefilter(self, context):
+        # Local lexicon + classifier score; articles below the threshold never reach the LLM
+        if 'prefilter_passed' not in context:
+            context['relevance'], context['prefilter_passed'] = self.prefilter.decide(article_text(context['article']))
+            if not context['prefilter_passed']:
+                logging.info(f"Article scored {context['relevance']:.2f} in the prefilter, skipping")
+        return context['prefilter_passed']
+
+    def _passes_prefilter(self, context):
+        # Applied ahead of the batched LLM stages so rejected articles stay out of batches
+        if self.prefilter is None:
+            return True
+        # The prefilter stage itself replays this result later, so the lookup is not counted
+        journaled = self.journal.get(context['key'], 'prefilter', replay=False) if self.journal else None
+        if journaled is not None:
+            status, saved = journaled
+            return status == 'ok' and saved['passed']
+        return self._check_prefilter(context)
+
+    def _check_special_situation(self, context):
+        # Determine if it's a special situation or obvious price catalyst
+        result = context.get('is_special_situation')
+        if result is None:
+            # Raises LLMError on an outage, so no label is recorded for a failed classification
+            result = is_special_situation(context['article']['description'], self.config)
+        if self.prefilter is not None and isinstance(result, bool):
+            # Only genuine LLM verdicts become training labels for the prefilter's classifier
+            self.prefilter.add_label(context['key'], article_text(context['article']), result, context.get('relevance'))
+        if result:
+            return True
+        logging.info("Article did not meet the special situation criteria, skipping")
+        return False
+
+    def _check_tickers(self, context):
+        # Extract tickers or relevant companies from the article
+        company_names = context.get('company_names')
+        if company_names is None:
+            company_names = extract_company_names(context['article']['description'], self.config)
+        tickers = resolve_tickers(company_names, self.resolved_names)
+        logging.debug(f"Extracted tickers: {tickers}")
+        context['tickers'] = tickers
+        if not tickers:
+            logging.info("No tickers found in article, skipping")
+            return False
+        return True
+
+    def _check_market_cap(self, context):
+        ticker = context['ticker']
+        # Served from the bulk snapshot taken in prefetch_quotes
+        quote = self.data_processor.get_quote_snapshot([ticker]).get(ticker, {})
+        context['quote'] = quote
+        # Check if market cap is under $500 million (MAX_MARKET_CAP)
+        market_cap = quote.get('market_cap')
+        max_market_cap = getattr(self.config, 'MAX_MARKET_CAP', 500_000_000)
+        if market_cap is None:
+            logging.warning(f"Market cap data missing for {ticker}, skipping")
+            return False
+        if market_cap >= max_market_cap:
+            logging.info(f"Ticker {ticker} has market cap over ${max_market_cap / 1e6:,.0f} million, skipping")
+            return False
+        return True
+
+    def analyze_ticker(self, context):
+        ticker = context['ticker']
+        stock_data = context.get('stock_data') or self.data_processor.get_stock_data(ticker)
+        sec_filings = context.get('sec_filings')
+        if sec_filings is None:
+            sec_filings = self.data_processor.get_sec_filings(ticker)
+
+        # Perform analysis; DCF and indicators usually arrive from prefetch_valuations
+        sec_analysis = self.analyzer.analyze_sec_filings(sec_filings)
+        if 'dcf_value' in context:
+            dcf_value = context['dcf_value']
+        else:
+            financials = self.data_processor.get_financials(ticker, sec_filings)
+            dcf_value = self.analyzer.perform_dcf_analysis(financials, context.get('quote'))
+        if 'tech_analysis' in context:
+            tech_analysis = context['tech_analysis']
+        else:
+            tech_analysis = self.analyzer.perform_technical_analysis(stock_data)
+        insider_trades = self.analyzer.analyze_insider_trading(ticker, stock_data)
+
+        # Summarize a bounded digest of the findings rather than the raw frames and filings
+        record = build_digest(
+            ticker,
+            sec_analysis=sec_analysis,
+            dcf_value=dcf_value,
+            tech_analysis=tech_analysis,
+            insider_trades=insider_trades,
+            quote=context.get('quote'),
+            filing_token_budget=getattr(self.config, 'FILING_TOKEN_BUDGET', 1500)
+        )
+        findings_text = format_digest(record)
+        findings = self.analyzer.summarize_findings(findings_text)
+        logging.info(f"Completed analysis for {ticker}")
+        return findings
+
+    def analyze_ticker_journaled(self, context):
+        with stage_context('analyze'):
+            return self._analyze_journaled(context)
+
+    def _analyze_journaled(self, context):
+        journaled = self.journal.get(context['key'], 'analyze') if self.journal else None
+        if journaled is not None:
+            status, findings = journaled
+            return findings if status == 'ok' else None
+        try:
+            findings = self.analyze_ticker(context)
+        except Exception as e:
+            if self.journal:
+                self.journal.record(context['key'], 'analyze', str(e), status='failed')
+            raise
+        if self.journal:
+            self.journal.record(context['key'], 'analyze', findings)
+        return findings
+
+    def _ticker_contexts(self, context):
+        # Tickers repeated within one article are only analyzed once
+        return [
+            {'key': f"{context['key']}|{ticker.upper()}", 'article': context['article'], 'ticker': ticker}
+            for ticker in dict.fromkeys(context.get('tickers', []))
+        ]
+
+    def _batched_stages(self):
+        if getattr(self.config, 'LLM_BATCH_SIZE', 1) <= 1:
+            return []
+        return [stage.name for stage in self.article_stages if stage.name in BATCHED_STAGES]
+
+    def _pending_batches(self, contexts, done_fields):
+        # Only articles still alive after the earlier batched stages go into the next one
+        items = {c['id']: c['article']['description'] for c in contexts if all(c.get(f) for f in done_fields)}
+        return plan_batches(items, self.config)
+
+    def _journaled(self, context, stage_name):
+        return self.journal is not None and self.journal.get(context['key'], stage_name, replay=False) is not None
+
+    def _apply_batch(self, contexts, field, results):
+        by_id = {c['id']: c for c in contexts}
+        for item_id, value in results.items():
+            by_id[item_id][field] = value
+
+    def prefetch_batches(self, contexts):
+        done_fields = []
+        for name in self._batched_stages():
+            field, batch_func = BATCHED_STAGES[name]
+            pending = [c for c in contexts if not self._journaled(c, name) and self._passes_prefilter(c)]
+            for batch in self._pending_batches(pending, done_fields):
+                with stage_context(name):
+                    self._apply_batch(contexts, field, batch_func(batch, self.config))
+            done_fields.append(field)
+        self.prefetch_names(contexts)
+
+    def prefetch_names(self, contexts):
+        # Resolve every distinct name the batched extract stage found, once, before per-article checks
+        names = [name for c in contexts for name in c.get('company_names') or []]
+        if names:
+            before = len(self.resolved_names)
+            resolve_names(names, self.resolved_names)
+            logging.info(f"Resolved {len(self.resolved_names) - before} distinct company names from {len(names)} mentions")
+
+    def _article_contexts(self, articles):
+        return [{'id': f"a{i+1}", 'key': article_key(article), 'article': article} for i, article in enumerate(articles)]
+
+    def _article_passes(self, i, total, context):
+        logging.info(f"Processing article {i+1}/{total}")
+        try:
+            return all(stage(context) for stage in self.article_stages)
+        except Exception as e:
+            logging.error(f"Error processing article: {str(e)}")
+            return False
+
+    def prefetch_quotes(self, ticker_contexts):
+        # One bulk quote fetch for every candidate ticker instead of a per-ticker .info scrape
+        tickers = [c['ticker'] for c in ticker_contexts if not self._journaled(c, 'market_cap')]
+        if tickers and any(stage.name == 'market_cap' for stage in self.ticker_stages):
+            self.data_processor.get_quote_snapshot(tickers)
+
+    def _valuation_contexts(self, ticker_contexts):
+        # Tickers still to analyze, each with every context that mentions it
+        pending = {}
+        for c in ticker_contexts:
+            if not self._journaled(c, 'analyze'):
+                pending.setdefault(c['ticker'], []).append(c)
+        return pending
+
+    def fetch_valuation_inputs(self, context):
+        # Per-ticker network work (filings, statements, price history); runs under the
+        # 'valuation' stage limit
+        ticker = context['ticker']
+        try:
+            stock_data = context.get('stock_data') or self.data_processor.get_stock_data(ticker)
+            sec_filings = self.data_processor.get_sec_filings(ticker)
+            financials = self.data_processor.get_financials(ticker, sec_filings)
+        except Exception as e:
+            logging.warning(f"Could not prefetch valuation inputs for {ticker}: {str(e)}")
+            return None
+        try:
+            price_window = self.analyzer.price_window(stock_data)
+        except Exception as e:
+            logging.warning(f"Could not load price history for {ticker}: {str(e)}")
+            price_window = None
+        return {
+            'stock_data': stock_data,
+            'sec_filings': sec_filings,
+            'dcf_inputs': self.analyzer.dcf_inputs(financials, context.get('quote')),
+            'price_window': price_window
+        }
+
+    def apply_valuations(self, pending, inputs):
+        # The batched step: one DCF grid and one indicator pass over every ticker whose
+        # inputs arrived; the rest are left to analyze_ticker
+        tickers = [ticker for ticker in pending if inputs.get(ticker) is not None]
+        if not tickers:
+            return
+        dcf_values = self.analyzer.value_dcf([inputs[ticker]['dcf_inputs'] for ticker in tickers])
+        priced = [ticker for ticker in tickers if inputs[ticker]['price_window'] is not None]
+        tech_analyses = self.analyzer.technical_summary(priced, [inputs[t]['price_window'] for t in priced]) if priced else {}
+        for ticker, dcf_value in zip(tickers, dcf_values):
+            for c in pending[ticker]:
+                c.update(stock_data=inputs[ticker]['stock_data'], sec_filings=inputs[ticker]['sec_filings'], dcf_value=dcf_value)
+                if ticker in tech_analyses:
+                    c['tech_analysis'] = tech_analyses[ticker]
+        logging.info(f"Valued {len(tickers)} tickers in one batch")
+
+    def prefetch_valuations(self, ticker_contexts):
+        pending = self._valuation_contexts(ticker_contexts)
+        inputs = {ticker: self.fetch_valuation_inputs(contexts[0]) for ticker, contexts in pending.items()}
+        self.apply_valuations(pending, inputs)
+
+    def _ticker_passes(self, ticker_context):
+        try:
+            return all(stage(ticker_context) for stage in self.ticker_stages)
+        except Exception as e:
+            logging.error(f"Error processing ticker {ticker_context['ticker']}: {str(e)}")
+            return False
+
+    def process_ticker(self, ticker_context):
+        try:
+            return self.analyze_ticker_journaled(ticker_context)
+        except Exception as e:
+            logging.error(f"Error processing ticker {ticker_context['ticker']}: {str(e)}")
+        return None
+
+    def run(self, articles):
+        contexts = self._article_contexts(articles)
+        self.prefetch_batches(contexts)
+        passed = [c for i, c in enumerate(contexts) if self._article_passes(i, len(contexts), c)]
+
+        ticker_contexts = [tc for c in passed for tc in self._ticker_contexts(c)]
+        self.prefetch_quotes(ticker_contexts)
+        # Every ticker stage runs before any analysis, while the bulk quote snapshot is fresh
+        survivors = [tc for tc in ticker_contexts if self._ticker_passes(tc)]
+        self.prefetch_valuations(survivors)
+        findings = [self.process_ticker(tc) for tc in survivors]
+        self.log_funnel()
+        return [f for f in findings if f is not None]
+
+    def stage_limits(self, concurrency):
+        # Per-stage overrides come from config, e.g. {'analyze': 2}
+        overrides = getattr(self.config, 'PIPELINE_STAGE_CONCURRENCY', {})
+        names = [stage.name for stage in self.article_stages + self.ticker_stages] + ['valuation', 'analyze']
+        return {name: max(1, overrides.get(name, concurrency)) for name in names}
+
+    async def run_async(self, articles, concurrency):
+        limits = self.stage_limits(concurrency)
+        semaphores = {name: asyncio.Semaphore(limit) for name, limit in limits.items()}
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=sum(limits.values()))
+
+        def in_stage(name, func, *args):
+            with stage_context(name):
+                return func(*args)
+
+        async def run_stage(name, func, *args):
+            async with semaphores[name]:
+                return await loop.run_in_executor(executor, in_stage, name, func, *args)
+
+        async def ticker_passes(ticker_context):
+            try:
+                for stage in self.ticker_stages:
+                    if not await run_stage(stage.name, stage, ticker_context):
+                        return False
+                return True
+            except Exception as e:
+                logging.error(f"Error processing ticker {ticker_context['ticker']}: {str(e)}")
+                return False
+
+        async def process_ticker(ticker_context):
+            try:
+                return await run_stage('analyze', self.analyze_ticker_journaled, ticker_context)
+            except Exception as e:
+                logging.error(f"Error processing ticker {ticker_context['ticker']}: {str(e)}")
+            return None
+
+        async def prefetch_batches(contexts):
+            done_fields = []
+            for name in self._batched_stages():
+                field, batch_func = BATCHED_STAGES[name]
+                pending = [c for c in contexts if not self._journaled(c, name) and self._passes_prefilter(c)]
+                batches = self._pending_batches(pending, done_fields)
+                results = await asyncio.gather(*(run_stage(name, batch_func, batch, self.config) for batch in batches))
+                for batch_results in results:
+                    self._apply_batch(contexts, field, batch_results)
+                done_fields.append(field)
+            await loop.run_in_executor(executor, self.prefetch_names, contexts)
+
+        async def article_passes(i, context):
+            logging.info(f"Processing article {i+1}/{len(articles)}")
+            try:
+                for stage in self.article_stages:
+                    if not await run_stage(stage.name, stage, context):
+                        return False
+                return True
+            except Exception as e:
+                logging.error(f"Error processing article: {str(e)}")
+                return False
+
+        logging.info(f"Running concurrent pipeline with stage limits {limits}")
+        try:
+            # gather keeps article and ticker order, so results line up with run()
+            contexts = self._article_contexts(articles)
+            await prefetch_batches(contexts)
+            passed = await asyncio.gather(*(article_passes(i, c) for i, c in enumerate(contexts)))
+
+            ticker_contexts = [tc for c, ok in zip(contexts, passed) if ok for tc in self._ticker_contexts(c)]
+            await loop.run_in_executor(executor, self.prefetch_quotes, ticker_contexts)
+            ticker_passed = await asyncio.gather(*(ticker_passes(tc) for tc in ticker_contexts))
+            survivors = [tc for tc, ok in zip(ticker_contexts, ticker_passed) if ok]
+            # Per-ticker valuation I/O runs under its stage limit; only the NumPy step is batched
+            pending = self._valuation_contexts(survivors)
+            fetched = await asyncio.gather(*(run_stage('valuation', self.fetch_valuation_inputs, cs[0]) for cs in pending.values()))
+            await loop.run_in_executor(executor, self.apply_valuations, pending, dict(zip(pending, fetched)))
+            findings = await asyncio.gather(*(process_ticker(tc) for tc in survivors))
+        finally:
+            executor.shutdown(wait=False)
+        self.log_funnel()
+        return [f for f in findings if f is not None]
+
+    def log_funnel(self):
+        for stage in self.article_stages + self.ticker_stages:
+            logging.info(f"Funnel stage '{stage.name}': {stage.passed} passed, {stage.failed} filtered out")
+        if self.prefilter is not None:
+            self.prefilter.log_stats()
@@ -0,0 +1,217 @@
+# prefilter.py
+
+import argparse
+import logging
+import math
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from utils import CACHE_DIR
+
+# (pattern, weight); positive weights mark likely special situations, negative ones
+# the boilerplate and macro news that rarely are
+LEXICON = [
+    (r"\bmerg(?:er|e|es|ing)\b", 1.0),
+    (r"\bspin[- ]?offs?\b|\bspins? off\b|\bspun off\b", 1.0),
+    (r"\btender offers?\b", 1.0),
+    (r"\brights offerings?\b", 1.0),
+    (r"\b13[dD]\b|\bschedule 13[dD]\b", 1.0),
+    (r"\bdefinitive agreement\b", 1.0),
+    (r"\bgoing private\b|\btake[- ]private\b", 1.0),
+    (r"\bstrategic alternatives\b", 1.0),
+    (r"\bproxy (?:fight|contest)\b|\bactivist\b", 0.8),
+    (r"\bchapter 11\b|\bbankruptcy\b|\bemerg(?:es|ed|ing) from\b", 0.8),
+    (r"\bacqui(?:re|res|red|ring|sition|sitions)\b|\btakeover\b|\bbuyout\b", 0.6),
+    (r"\bdivest(?:s|ed|iture|ment)?\b|\basset sale\b", 0.6),
+    (r"\bspecial dividend\b|\bliquidat(?:e|ion|ing)\b", 0.6),
+    (r"\b(?:share |stock )?(?:buyback|repurchase)s?\b", 0.5),
+    (r"\brestructur(?:e|ing)\b|\brecapitali[sz]ation\b", 0.5),
+    (r"\breverse (?:stock )?split\b|\bdelist(?:ed|ing)?\b|\buplist(?:ed|ing)?\b", 0.5),
+    (r"\bfda approv(?:al|es|ed)\b|\bcontract award\b", 0.5),
+    (r"\bearnings call transcript\b|\bq[1-4] \d{4} earnings call\b", -1.0),
+    (r"\bconference call\b|\bprepared remarks\b", -0.5),
+    (r"\bfederal reserve\b|\bthe fed\b|\binflation\b|\bcpi\b|\bjobs report\b|\btreasury yields?\b", -0.5),
+]
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def article_text(article):
+    return f"{article.get('title') or ''}\n{article.get('description') or ''}"
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+class ArticlePrefilter:
+    def __init__(self, path=os.path.join(CACHE_DIR, 'prefilter.sqlite'), threshold=0.3, sample_rate=0.05, min_labels=50):
+        self.threshold = threshold
+        # Share of rejected articles sent to the LLM anyway, so labels keep covering them
+        self.sample_rate = sample_rate
+        self.min_labels = min_labels
+        self.lexicon = [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in LEXICON]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS labels (key TEXT PRIMARY KEY, text TEXT, label INTEGER, labeled_at REAL, weight REAL DEFAULT 1.0)")
+        if 'weight' not in {row[1] for row in self._conn.execute("PRAGMA table_info(labels)")}:
+            # Labels stored before sampled rejects were weighted count once
+            self._conn.execute("ALTER TABLE labels ADD COLUMN weight REAL DEFAULT 1.0")
+        self._conn.commit()
+
+        # Multinomial naive Bayes counts, indexed by label (0 = not a special situation)
+        self.word_counts = (Counter(), Counter())
+        self.doc_counts = [0, 0]
+        self.total_words = [0, 0]
+        self.vocabulary = set()
+        for text, label in self._conn.execute("SELECT text, label FROM labels"):
+            self._learn(tokenize(text), label)
+        self.stats = {'scored': 0, 'passed': 0, 'sampled': 0}
+        # (prefilter score, LLM label, weight) triples seen since the last log_stats
+        self.observed = []
+
+    def _learn(self, tokens, label):
+        counts = Counter(tokens)
+        self.word_counts[label].update(counts)
+        self.doc_counts[label] += 1
+        self.total_words[label] += len(tokens)
+        self.vocabulary.update(counts)
+
+    def label_weight(self, score):
+        # Only sample_rate of the rejects get an LLM label, so each one stands in for
+        # 1 / sample_rate rejects when precision and recall are estimated
+        if score is not None and score < self.threshold and self.sample_rate > 0:
+            return 1.0 / self.sample_rate
+        return 1.0
+
+    def add_label(self, key, text, label, score=None):
+        # Called with the LLM's verdict for an article; the first verdict per article wins
+        label = int(bool(label))
+        weight = self.label_weight(score)
+        with self._lock:
+            if score is not None:
+                self.observed.append((score, label, weight))
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO labels (key, text, label, labeled_at, weight) VALUES (?, ?, ?, ?, ?)",
+                (key, text, label, time.time(), weight)
+            ).rowcount
+            self._conn.commit()
+            if inserted:
+                self._learn(tokenize(text), label)
+
+    def lexicon_score(self, text):
+        positive = negative = 0.0
+        for pattern, weight in self.lexicon:
+            if pattern.search(text):
+                if weight > 0:
+                    positive += weight
+                else:
+                    negative -= weight
+        return (1.0 - math.exp(-positive)) * math.exp(-negative)
+
+    def trained(self):
+        return sum(self.doc_counts) >= self.min_labels and all(self.doc_counts)
+
+    def classifier_probability(self, tokens, exclude=None):
+        # P(special situation | tokens); exclude=(label, Counter) leaves one labeled
+        # article out of the counts for evaluation
+        vocabulary = max(1, len(self.vocabulary))
+        total_docs = sum(self.doc_counts) - (1 if exclude else 0)
+        log_probs = []
+        for label in (0, 1):
+            removed = exclude[1] if exclude and exclude[0] == label else Counter()
+            docs = self.doc_counts[label] - (1 if removed else 0)
+            if docs <= 0:
+                return None
+            denominator = math.log(self.total_words[label] - sum(removed.values()) + vocabulary)
+            log_prob = math.log(docs / total_docs)
+            counts = self.word_counts[label]
+            for token in tokens:
+                log_prob += math.log(counts.get(token, 0) - removed.get(token, 0) + 1) - denominator
+            log_probs.append(log_prob)
+        return 1.0 / (1.0 + math.exp(max(-50.0, min(50.0, log_probs[0] - log_probs[1]))))
+
+    def score(self, text, exclude=None):
+        # Lexicon alone until enough LLM labels exist, then the mean of both signals
+        lexicon = self.lexicon_score(text)
+        if not self.trained():
+            return lexicon
+        probability = self.classifier_probability(tokenize(text), exclude)
+        return lexicon if probability is None else (lexicon + probability) / 2
+
+    def decide(self, text):
+        # Returns (score, passed); a small random sample of rejects passes anyway
+        with self._lock:
+            score = self.score(text)
+        passed = score >= self.threshold
+        sampled = not passed and random.random() < self.sample_rate
+        with self._lock:
+            self.stats['scored'] += 1
+            self.stats['passed'] += passed
+            self.stats['sampled'] += sampled
+        return score, passed or sampled
+
+    def evaluate(self, thresholds):
+        # Leave-one-out precision/recall against the LLM labels for each threshold, with
+        # sampled rejects weighted up to the share of rejects they stand for
+        with self._lock:
+            rows = self._conn.execute("SELECT text, label, weight FROM labels").fetchall()
+            scored = []
+            for text, label, weight in rows:
+                tokens = tokenize(text)
+                scored.append((self.score(text, exclude=(label, Counter(tokens))), label, weight or 1.0))
+        report = []
+        for threshold in thresholds:
+            metrics = weighted_metrics(scored, threshold)
+            metrics.update(threshold=threshold, labels=len(scored))
+            report.append(metrics)
+        return report
+
+    def log_stats(self):
+        # Reports and resets the counters, so a long-lived prefilter logs per run. Precision and
+        # recall cover this run's LLM-labelled articles; `python prefilter.py` runs the full
+        # leave-one-out evaluation.
+        with self._lock:
+            stats, observed = self.stats, self.observed
+            self.stats = {'scored': 0, 'passed': 0, 'sampled': 0}
+            self.observed = []
+        logging.info(
+            f"Prefilter: {stats['scored']} articles scored, {stats['passed']} above threshold {self.threshold}, "
+            f"{stats['sampled']} sampled below it ({sum(self.doc_counts)} LLM labels, "
+            f"classifier {'on' if self.trained() else 'off'})"
+        )
+        metrics = weighted_metrics(observed, self.threshold)
+        if metrics['precision'] is not None and metrics['recall'] is not None:
+            logging.info(
+                f"Prefilter vs LLM labels this run at {self.threshold}: precision {metrics['precision']:.2f}, "
+                f"recall {metrics['recall']:.2f} over {len(observed)} labels (sampled rejects weighted)"
+            )
+
+def weighted_metrics(scored, threshold):
+    # scored: (score, label, weight); weighted sums estimate the counts over every article
+    true_positive = sum(weight for score, label, weight in scored if score >= threshold and label)
+    predicted = sum(weight for score, _, weight in scored if score >= threshold)
+    actual = sum(weight for _, label, weight in scored if label)
+    total = sum(weight for _, _, weight in scored)
+    return {
+        'precision': true_positive / predicted if predicted else None,
+        'recall': true_positive / actual if actual else None,
+        'pass_rate': predicted / total if total else None
+    }
+
+def _format(value):
+    return '-' if value is None else f"{value:.2f}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report prefilter precision/recall against past LLM labels")
+    parser.add_argument("--thresholds", type=float, nargs='+', default=[0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7])
+    args = parser.parse_args()
+
+    prefilter = ArticlePrefilter()
+    print(f"{'threshold':>9} {'precision':>9} {'recall':>7} {'pass rate':>9} {'labels':>7}")
+    for row in prefilter.evaluate(args.thresholds):
+        print(f"{row['threshold']:>9.2f} {_format(row['precision']):>9} {_format(row['recall']):>7} {_format(row['pass_rate']):>9} {row['labels']:>7}")
@@ -0,0 +1,107 @@
+# price_store.py
+
+import logging
+import os
+import threading
+import numpy as np
+from utils import CACHE_DIR
+
+PRICE_DTYPE = np.dtype([
+    ('date', 'datetime64[ns]'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8')
+])
+
+class PriceStore:
+    def __init__(self, root=os.path.join(CACHE_DIR, 'prices'), initial_period='2y'):
+        self.root = root
+        self.initial_period = initial_period
+        os.makedirs(root, exist_ok=True)
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _path(self, ticker):
+        return os.path.join(self.root, f"{ticker.upper()}.npy")
+
+    def _lock(self, ticker):
+        with self._locks_lock:
+            return self._locks.setdefault(ticker.upper(), threading.Lock())
+
+    def load(self, ticker):
+        # Memory-mapped, read-only view of the stored bars (no copy until sliced into pandas)
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=PRICE_DTYPE)
+        return np.load(path, mmap_mode='r')
+
+    def update(self, ticker, stock_data):
+        with self._lock(ticker):
+            stored = self.load(ticker)
+            today = np.datetime64('today', 'D')
+            # Only completed daily bars are stored, so a store that already holds the
+            # previous business day needs no network call
+            last_complete = np.busday_offset(today, -1, roll='forward')
+            if len(stored) and stored['date'][-1].astype('datetime64[D]') >= last_complete:
+                return stored
+
+            if len(stored):
+                start = (stored['date'][-1].astype('datetime64[D]') + 1).astype(str)
+                history = stock_data.history(start=start, end=str(today))
+            else:
+                history = stock_data.history(period=self.initial_period, end=str(today))
+            if len(stored) and self._has_corporate_action(history):
+                # history() is split- and dividend-adjusted, so a new action rescales every
+                # stored bar; refetch the whole span rather than mixing scales
+                first = stored['date'][0].astype('datetime64[D]').astype(str)
+                logging.info(f"Price store: corporate action for {ticker}, reloading history since {first}")
+                combined = self._to_records(stock_data.history(start=first, end=str(today)))
+                if not len(combined):
+                    return stored
+            else:
+                new_bars = self._to_records(history)
+                if len(stored):
+                    new_bars = new_bars[new_bars['date'] > stored['date'][-1]]
+                logging.info(f"Price store: {len(new_bars)} new bars for {ticker} ({len(stored)} stored)")
+                if not len(new_bars):
+                    return stored
+                combined = np.concatenate([np.asarray(stored), new_bars])
+
+            path = self._path(ticker)
+            tmp_path = path + '.tmp.npy'
+            np.save(tmp_path, combined)
+            del stored  # release the mmap before replacing the file
+            os.replace(tmp_path, path)
+            return self.load(ticker)
+
+    def _has_corporate_action(self, history):
+        if history is None or history.empty:
+            return False
+        for column in ('Stock Splits', 'Dividends'):
+            if column in history and (history[column].fillna(0) != 0).any():
+                return True
+        return False
+
+    def _to_records(self, history):
+        if history is None or history.empty:
+            return np.empty(0, dtype=PRICE_DTYPE)
+        index = history.index
+        if getattr(index, 'tz', None) is not None:
+            index = index.tz_localize(None)
+        records = np.empty(len(history), dtype=PRICE_DTYPE)
+        records['date'] = index.normalize().values
+        records['open'] = history['Open'].to_numpy(dtype='f8')
+        records['high'] = history['High'].to_numpy(dtype='f8')
+        records['low'] = history['Low'].to_numpy(dtype='f8')
+        records['close'] = history['Close'].to_numpy(dtype='f8')
+        records['volume'] = history['Volume'].to_numpy(dtype='f8')
+        return records
+
+    def window(self, ticker, stock_data, days=365):
+        bars = self.update(ticker, stock_data)
+        cutoff = np.datetime64('today', 'D') - days
+        # Dates are sorted, so the window is a contiguous slice of the mmap
+        return bars[np.searchsorted(bars['date'], cutoff):]
+
@@ -0,0 +1,118 @@
+# rate_limiter.py
+
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# (requests per second, burst capacity) per upstream; keys are bucket names,
+# e.g. 'openrouter', 'openrouter:<model>', 'yahoo'. Overridable via config.RATE_LIMITS.
+DEFAULT_RATE_LIMITS = {
+    'openrouter': (5.0, 10),
+    'yahoo': (2.0, 5),
+    'default': (5.0, 5),
+}
+
+class TokenBucket:
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {'acquired': 0, 'waited': 0, 'wait_time': 0.0, 'max_wait': 0.0}
+
+    def _reserve(self):
+        # Takes a token now and returns how long the caller must wait before using it.
+        # The lock only covers the arithmetic; callers sleep outside it.
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1.0
+            wait = max(0.0, -self.tokens / self.rate, self.blocked_until - now)
+            self.stats['acquired'] += 1
+            if wait > 0:
+                self.stats['waited'] += 1
+                self.stats['wait_time'] += wait
+                self.stats['max_wait'] = max(self.stats['max_wait'], wait)
+            return wait
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        logging.warning(f"Rate limiter '{self.name}' paused for {seconds:.1f}s")
+
+    def update_from_headers(self, headers):
+        # Returns the server-requested wait in seconds, if any, and pauses the bucket for it
+        wait = retry_after_seconds(headers)
+        if wait is None and headers.get('X-RateLimit-Remaining') == '0':
+            wait = _reset_seconds(headers.get('X-RateLimit-Reset'))
+        if wait:
+            self.pause(wait)
+        return wait
+
+def retry_after_seconds(headers):
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _reset_seconds(value):
+    if not value:
+        return None
+    try:
+        reset = float(value)
+    except ValueError:
+        return None
+    # Providers send either epoch seconds, epoch milliseconds or seconds from now
+    if reset > 1e12:
+        reset /= 1000.0
+    if reset > 1e9:
+        reset -= time.time()
+    return max(0.0, reset)
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+_limits = dict(DEFAULT_RATE_LIMITS)
+
+def configure(config):
+    with _buckets_lock:
+        _limits.update(getattr(config, 'RATE_LIMITS', {}))
+
+def get_bucket(name):
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None:
+            # 'openrouter:<model>' without its own entry copies the provider's rate and burst;
+            # it is a separate bucket, so callers also acquire the host bucket for the combined cap
+            rate, capacity = _limits.get(name) or _limits.get(name.split(':', 1)[0]) or _limits['default']
+            bucket = TokenBucket(name, rate, capacity)
+            _buckets[name] = bucket
+        return bucket
+
+def log_stats():
+    with _buckets_lock:
+        buckets = list(_buckets.values())
+    for bucket in buckets:
+        stats = bucket.stats
+        if stats['acquired']:
+            logging.info(
+                f"Rate limiter '{bucket.name}': {stats['acquired']} requests, {stats['waited']} waited, "
+                f"{stats['wait_time']:.1f}s total wait, {stats['max_wait']:.1f}s max"
+            )
@@ -1,75 +1,152 @@
 # recommendations.py
 
-import requests
-from utils import rate_limit
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import BaseModel, Field, ValidationError
+from llm_client import get_client, LLMError
+from structured import extract_json, StructuredOutputError
+
+GENERATE_PROMPT = """
+            Based on the following analysis, generate a trade recommendation with specific details, including the ticker symbol, entry price, stop-loss, take-profit levels, and time horizon. Include rationale and supporting evidence.
+
+            Analysis: {analysis}
+            """
+
+SCORE_PROMPT = """
+            Evaluate the following trade recommendation based on the likelihood of significant upside, well-understood downside risk, and opportunity cost of capital. Provide a score between 1 and 10 and justify your rating.
+
+            Return a single JSON object with the keys "score" (a number) and "justification". Do not include any additional text.
+
+            Recommendation: {recommendation}
+
+            Example output format:
+            {{"score": 7, "justification": "..."}}
+            """
+
+SCORE_BATCH_PROMPT = """
+            Evaluate each of the following trade recommendations based on the likelihood of significant upside, well-understood downside risk, and opportunity cost of capital. Score each one between 1 and 10 and justify the rating.
+
+            Return a single JSON object keyed by recommendation id, with one entry for every id below. Do not include any additional text.
+
+            Recommendations: {recommendations}
+
+            Example output format:
+            {{"r1": {{"score": 7, "justification": "..."}}, "r2": {{"score": 3, "justification": "..."}}}}
+            """
+
+MERGED_PROMPT = """
+            Based on the following analysis, generate a trade recommendation with specific details, including the ticker symbol, entry price, stop-loss, take-profit levels, and time horizon. Include rationale and supporting evidence.
+
+            Then evaluate your recommendation based on the likelihood of significant upside, well-understood downside risk, and opportunity cost of capital. Provide a score between 1 and 10 and justify your rating.
+
+            Return a single JSON object with the keys "recommendation", "score" and "justification". Do not include any additional text.
+
+            Analysis: {analysis}
+            """
+
+class RecommendationScore(BaseModel):
+    score: float = Field(ge=1, le=10)
+    justification: str
+
+class ScoredRecommendation(RecommendationScore):
+    recommendation: str
+
+def _scored(recommendation, score):
+    return {'recommendation': recommendation, 'score': score.score, 'justification': score.justification}
 
 class Recommender:
     def __init__(self, config):
         self.config = config
+        self.llm = get_client(config)
+        self.workers = max(1, getattr(config, 'RECOMMENDER_WORKERS', 4))
+        self.score_batch_size = max(1, getattr(config, 'RECOMMENDER_SCORE_BATCH_SIZE', 1))
+        self.min_score = getattr(config, 'MIN_RECOMMENDATION_SCORE', 0)
+        self.repair_attempts = getattr(config, 'LLM_REPAIR_ATTEMPTS', 1)
+
+    def _map(self, func, items):
+        # Runs func over items concurrently; results keep the input order and a failed
+        # item yields None without affecting the others
+        if self.workers == 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(items))) as executor:
+            return list(executor.map(func, items))
+
+    def _messages(self, prompt):
+        return [
+            {"role": "user", "content": prompt}
+        ]
+
+    def _ask(self, prompt):
+        # Use OpenRouter and SMART_LLM for recommendations and scoring
+        return self.llm.chat(self.config.SMART_LLM, self._messages(prompt))
+
+    def _ask_structured(self, prompt, schema):
+        return self.llm.chat_structured(self.config.SMART_LLM, self._messages(prompt), schema, repair_attempts=self.repair_attempts)
+
+    def rank_recommendations(self, scored_recommendations):
+        # Best first; anything under MIN_RECOMMENDATION_SCORE is dropped without another call
+        kept = [rec for rec in scored_recommendations if rec['score'] >= self.min_score]
+        dropped = len(scored_recommendations) - len(kept)
+        if dropped:
+            print(f"Dropped {dropped} recommendations scoring below {self.min_score}")
+        return sorted(kept, key=lambda rec: rec['score'], reverse=True)
+
+    def _generate_one(self, result):
+        try:
+            return self._ask(GENERATE_PROMPT.format(analysis=result))
+        except LLMError as e:
+            print(f"Error generating recommendation: {e}")
+            return None
 
-    @rate_limit(5)
     def generate_trade_recommendations(self, analysis_results):
-        recommendations = []
-        for result in analysis_results:
-            prompt = f"""
-            Based on the following analysis, generate a trade recommendation with specific details, including the ticker symbol, entry price, stop-loss, take-profit levels, and time horizon. Include rationale and supporting evidence.
+        return [rec for rec in self._map(self._generate_one, analysis_results) if rec is not None]
+
+    def _score_one(self, rec):
+        try:
+            return _scored(rec, self._ask_structured(SCORE_PROMPT.format(recommendation=rec), RecommendationScore))
+        except LLMError as e:
+            print(f"Error scoring recommendation: {e}")
+            return None
+
+    def _score_batch(self, batch):
+        if len(batch) == 1:
+            return [self._score_one(batch[0])]
+        ids = [f"r{i+1}" for i in range(len(batch))]
+        payload = json.dumps([{"id": rec_id, "recommendation": rec} for rec_id, rec in zip(ids, batch)])
+        try:
+            response = extract_json(self.llm.chat(
+                self.config.SMART_LLM, self._messages(SCORE_BATCH_PROMPT.format(recommendations=payload)),
+                response_format={'type': 'json_object'}
+            ))
+        except (LLMError, StructuredOutputError) as e:
+            print(f"Error scoring batch of {len(batch)} recommendations: {e}")
+            response = {}
+        if not isinstance(response, dict):
+            response = {}
+
+        scored = []
+        for rec_id, rec in zip(ids, batch):
+            try:
+                scored.append(_scored(rec, RecommendationScore.model_validate(response.get(rec_id))))
+            except ValidationError:
+                # Missing or malformed entries fall back to a request of their own
+                scored.append(self._score_one(rec))
+        return scored
 
-            Analysis: {result}
-            """
-            # Use OpenRouter and SMART_LLM for generating recommendations
-            headers = {
-                "Authorization": f"Bearer {self.config.OPENROUTER_API_KEY}",
-            }
-            data = {
-                "model": self.config.SMART_LLM,
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ]
-            }
-            response = requests.post(
-                url="https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=data
-            )
-            if response.status_code == 200:
-                result = response.json()
-                recommendation = result['choices'][0]['message']['content'].strip()
-                recommendations.append(recommendation)
-            else:
-                print(f"Error generating recommendation: {response.text}")
-        return recommendations
-
-    @rate_limit(5)
     def score_recommendations(self, recommendations):
-        scored_recommendations = []
-        for rec in recommendations:
-            prompt = f"""
-            Evaluate the following trade recommendation based on the likelihood of significant upside, well-understood downside risk, and opportunity cost of capital. Provide a score between 1 and 10 and justify your rating.
+        batches = [recommendations[i:i + self.score_batch_size] for i in range(0, len(recommendations), self.score_batch_size)]
+        scored = [scored for batch in self._map(self._score_batch, batches) for scored in batch if scored is not None]
+        return self.rank_recommendations(scored)
 
-            Recommendation: {rec}
-            """
-            # Use OpenRouter and SMART_LLM for scoring
-            headers = {
-                "Authorization": f"Bearer {self.config.OPENROUTER_API_KEY}",
-            }
-            data = {
-                "model": self.config.SMART_LLM,
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ]
-            }
-            response = requests.post(
-                url="https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=data
-            )
-            if response.status_code == 200:
-                result = response.json()
-                score = result['choices'][0]['message']['content'].strip()
-                scored_recommendations.append({
-                    'recommendation': rec,
-                    'score': score
-                })
-            else:
-                print(f"Error scoring recommendation: {response.text}")
-        return scored_recommendations
\ No newline at end of file
+    def _generate_and_score_one(self, result):
+        try:
+            response = self._ask_structured(MERGED_PROMPT.format(analysis=result), ScoredRecommendation)
+        except LLMError as e:
+            print(f"Error generating scored recommendation: {e}")
+            return None
+        return _scored(response.recommendation, response)
+
+    def generate_and_score(self, analysis_results):
+        # One structured SMART_LLM call per candidate instead of separate generate and score calls
+        scored = [scored for scored in self._map(self._generate_and_score_one, analysis_results) if scored is not None]
+        return self.rank_recommendations(scored)
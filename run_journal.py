@@ -0,0 +1,97 @@
+# run_journal.py
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from utils import CACHE_DIR
+
+class RunJournal:
+    def __init__(self, run_id, path=os.path.join(CACHE_DIR, 'run_journal.sqlite'), replay_failures=False):
+        self.run_id = run_id
+        self.path = path
+        # When set, items that failed earlier stay failed instead of being retried
+        self.replay_failures = replay_failures
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, started_at REAL, articles TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stage_results ("
+            "run_id TEXT, item_key TEXT, stage TEXT, status TEXT, result TEXT, updated_at REAL, "
+            "PRIMARY KEY (run_id, item_key, stage))"
+        )
+        self._conn.commit()
+        self.replayed = 0
+
+    def start_run(self, articles):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, started_at, articles) VALUES (?, ?, ?)",
+                (self.run_id, time.time(), json.dumps(articles))
+            )
+            self._conn.commit()
+
+    def load_articles(self):
+        # The article list is journaled because feed dedup will not return the same items twice
+        with self._lock:
+            row = self._conn.execute("SELECT articles FROM runs WHERE run_id = ?", (self.run_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"No journaled run with id {self.run_id}")
+        return json.loads(row[0])
+
+    def get(self, item_key, stage, replay=True):
+        # Returns (status, result) of a finished stage, or None if it has to run. Lookups
+        # that only check whether a stage is done pass replay=False so they are not counted.
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, result FROM stage_results WHERE run_id = ? AND item_key = ? AND stage = ?",
+                (self.run_id, item_key, stage)
+            ).fetchone()
+        if row is None or (row[0] != 'ok' and not self.replay_failures):
+            return None
+        if replay:
+            with self._lock:
+                self.replayed += 1
+        return row[0], json.loads(row[1])
+
+    def record(self, item_key, stage, result, status='ok'):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stage_results (run_id, item_key, stage, status, result, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.run_id, item_key, stage, status, json.dumps(result, default=str), time.time())
+            )
+            self._conn.commit()
+
+    def failed_items(self, stages):
+        # Keys of items with a failed result in any of the given stages
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT DISTINCT item_key FROM stage_results WHERE run_id = ? AND status = 'failed' "
+                f"AND stage IN ({', '.join('?' for _ in stages)})",
+                (self.run_id, *stages)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def clear_ticker(self, ticker):
+        # Forgets every ticker-level stage for one ticker so it is recomputed on resume
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM stage_results WHERE run_id = ? AND item_key LIKE ?",
+                (self.run_id, f"%|{ticker.upper()}")
+            ).rowcount
+            self._conn.commit()
+        logging.info(f"Cleared {deleted} journaled stage results for {ticker} in run {self.run_id}")
+
+    def log_stats(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, status, COUNT(*) FROM stage_results WHERE run_id = ? GROUP BY stage, status",
+                (self.run_id,)
+            ).fetchall()
+        summary = ', '.join(f"{stage}/{status}: {count}" for stage, status, count in rows)
+        logging.info(f"Run {self.run_id} journal: {summary or 'empty'} ({self.replayed} results replayed)")
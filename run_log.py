@@ -0,0 +1,138 @@
+# run_log.py
+
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+CONSOLE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# One run at a time per process (see main.run_lock), so the run id is process-wide;
+# the stage is per thread/task because pipeline stages run concurrently
+_run_id = None
+_stage = contextvars.ContextVar('stage', default=None)
+
+def set_run_id(run_id):
+    global _run_id
+    _run_id = run_id
+
+@contextmanager
+def stage_context(name):
+    token = _stage.set(name)
+    try:
+        yield
+    finally:
+        _stage.reset(token)
+
+class RunContextFilter(logging.Filter):
+    def filter(self, record):
+        record.run_id = _run_id
+        record.stage = _stage.get()
+        return True
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'run_id': getattr(record, 'run_id', None),
+            'stage': getattr(record, 'stage', None),
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class RunQueueHandler(QueueHandler):
+    # The stock prepare() folds the traceback into the message and drops exc_info, which
+    # would leave JsonLinesFormatter no 'exc' to write; keep the message as logged and pass
+    # the formatted traceback on in exc_text (the console formatter appends it too)
+    def prepare(self, record):
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = logging.Formatter().formatException(record.exc_info)
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        record.exc_info, record.exc_text = None, exc_text
+        return record
+
+class StreamToLogger:
+    # Stand-in for sys.stdout/sys.stderr: complete lines become log records, so prints
+    # from this code and from libraries land in the run log too
+    def __init__(self, logger, level):
+        self.logger = logger
+        self.level = level
+        self._local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self._local, 'buffer', '') + text
+        *lines, self._local.buffer = buffer.split('\n')
+        for line in lines:
+            if line.strip():
+                self.logger.log(self.level, line.rstrip())
+        return len(text)
+
+    def flush(self):
+        buffer = getattr(self._local, 'buffer', '')
+        if buffer.strip():
+            self.logger.log(self.level, buffer.rstrip())
+        self._local.buffer = ''
+
+    def isatty(self):
+        return False
+
+def _file_handler(path, max_bytes, backup_count, when):
+    if when:
+        return TimedRotatingFileHandler(path, when=when, backupCount=backup_count, encoding='utf-8')
+    return RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+
+def setup_run_logging(config, level=logging.INFO):
+    # Callers only enqueue records; a listener thread formats them and writes to one
+    # buffered, rotating JSON-lines file plus the console. Returns the listener to stop.
+    log_dir = getattr(config, 'LOG_DIR', 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    file_handler = _file_handler(
+        os.path.join(log_dir, getattr(config, 'LOG_FILE', 'pipeline.jsonl')),
+        max_bytes=getattr(config, 'LOG_MAX_BYTES', 10 * 1024 * 1024),
+        backup_count=getattr(config, 'LOG_BACKUP_COUNT', 5),
+        when=getattr(config, 'LOG_ROTATE_WHEN', None)
+    )
+    file_handler.setFormatter(JsonLinesFormatter())
+    # The real stream, since sys.stderr itself is redirected into logging below
+    console_handler = logging.StreamHandler(sys.__stderr__)
+    console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = RunQueueHandler(log_queue)
+    queue_handler.addFilter(RunContextFilter())
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    listener.start()
+
+    sys.stdout = StreamToLogger(logging.getLogger('stdout'), logging.INFO)
+    sys.stderr = StreamToLogger(logging.getLogger('stderr'), logging.ERROR)
+    return listener
+
+def stop_run_logging(listener):
+    # Drains the queue and closes the file; call once at process exit
+    sys.stdout.flush()
+    sys.stderr.flush()
+    sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
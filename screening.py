@@ -0,0 +1,219 @@
+# screening.py
+
+import logging
+import json
+import requests
+from pydantic import BaseModel
+from llm_client import get_client, LLMError
+from structured import extract_json, StructuredOutputError
+from ticker_resolver import get_ticker_index
+from entity_cache import get_entity_cache, entity_key, MISSING
+import rate_limiter
+
+class SpecialSituation(BaseModel):
+    is_special_situation: bool
+
+class CompanyNames(BaseModel):
+    companies: list[str]
+
+def is_special_situation(article_content, config):
+    logging.info("Checking if article describes a special situation")
+    prompt = f"""
+    Analyze the following article content and determine if it describes any of the following:
+
+    - A corporate action (e.g., merger, acquisition, spinoff, rights offering)
+    - A special situation or workout
+    - A clear catalyst for short-term price movement
+
+    Provide a JSON object with a single key "is_special_situation" and a boolean value (true or false). Do not include any additional text.
+
+    Content: {article_content}
+
+    Example output format:
+    {{"is_special_situation": true}}
+    """
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant that analyzes text and determines if it describes a special situation, returning a JSON object."},
+        {"role": "user", "content": prompt}
+    ]
+
+    try:
+        response = get_client(config).chat_structured(
+            config.FAST_LLM, messages, SpecialSituation,
+            repair_attempts=getattr(config, 'LLM_REPAIR_ATTEMPTS', 1)
+        )
+    except LLMError as e:
+        # Raised rather than read as "not a special situation", so the failure is journaled and retried
+        logging.error(f"Error determining special situation: {str(e)}")
+        raise
+    return response.is_special_situation
+
+def extract_company_names(article_content, config):
+    prompt = f"""
+    Extract all company names mentioned in the following article content.
+    Provide a JSON object with a single key "companies" whose value is an array of strings, where each string is a company name.
+    Only include the JSON object in your response, with no additional text.
+
+    Content: {article_content}
+
+    Example output format:
+    {{"companies": ["Apple Inc.", "Microsoft Corporation", "Amazon.com, Inc."]}}
+    """
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant that extracts company names from text and returns them in a JSON object."},
+        {"role": "user", "content": prompt}
+    ]
+
+    try:
+        response = get_client(config).chat_structured(
+            config.FAST_LLM, messages, CompanyNames,
+            repair_attempts=getattr(config, 'LLM_REPAIR_ATTEMPTS', 1)
+        )
+    except LLMError as e:
+        logging.error(f"Error extracting company names: {str(e)}")
+        raise
+    return response.companies
+
+def resolve_names(company_list, resolved=None):
+    # Resolves each distinct normalized name once; pass the same dict to share it across a run
+    resolved = {} if resolved is None else resolved
+    for company_name in company_list:
+        key = entity_key(company_name)
+        if key not in resolved:
+            resolved[key] = get_ticker(company_name)
+    return resolved
+
+def resolve_tickers(company_list, resolved=None):
+    resolved = resolve_names(company_list, resolved)
+    tickers = []
+    for company_name in company_list:
+        ticker = resolved[entity_key(company_name)]
+        if ticker:
+            tickers.append(ticker)
+    logging.info(f"Extracted tickers: {tickers}")
+    return tickers
+
+def plan_batches(items, config):
+    # Pack {id: content} items into batches that fit the FAST_LLM context budget
+    max_items = getattr(config, 'LLM_BATCH_SIZE', 1)
+    token_budget = getattr(config, 'LLM_BATCH_TOKEN_BUDGET', 6000)
+    batches, batch, batch_tokens = [], {}, 0
+    for item_id, content in items.items():
+        # Rough token estimate: ~4 characters per token plus per-item framing
+        tokens = len(content) // 4 + 20
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > token_budget):
+            batches.append(batch)
+            batch, batch_tokens = {}, 0
+        batch[item_id] = content
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def _run_batch(batch, config, instructions, example, system_prompt, is_valid):
+    articles_json = json.dumps([{"id": item_id, "content": content} for item_id, content in batch.items()])
+    prompt = f"""
+    {instructions}
+
+    Return a single JSON object keyed by article id, with one entry for every article id below. Do not include any additional text.
+
+    Articles: {articles_json}
+
+    Example output format:
+    {example}
+    """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+    try:
+        response_text = get_client(config).chat(config.FAST_LLM, messages, response_format={'type': 'json_object'})
+        response_json = extract_json(response_text)
+    except (LLMError, StructuredOutputError) as e:
+        logging.error(f"Batch of {len(batch)} articles failed: {str(e)}")
+        response_json = {}
+    if not isinstance(response_json, dict):
+        logging.error(f"Unexpected batch response format: {response_json}")
+        response_json = {}
+
+    results = {item_id: response_json[item_id] for item_id in batch if is_valid(response_json.get(item_id))}
+    missing = [item_id for item_id in batch if item_id not in results]
+    if missing:
+        logging.warning(f"Batch response missing or malformed for {len(missing)}/{len(batch)} articles, retrying individually")
+    return results, missing
+
+def classify_articles_batch(batch, config):
+    logging.info(f"Checking {len(batch)} articles for special situations")
+    results, missing = _run_batch(
+        batch, config,
+        instructions="""For each article below, determine if it describes any of the following:
+
+    - A corporate action (e.g., merger, acquisition, spinoff, rights offering)
+    - A special situation or workout
+    - A clear catalyst for short-term price movement""",
+        example='{"a1": true, "a2": false}',
+        system_prompt="You are a helpful assistant that analyzes articles and determines which describe a special situation, returning a JSON object.",
+        is_valid=lambda value: isinstance(value, bool)
+    )
+    for item_id in missing:
+        try:
+            results[item_id] = is_special_situation(batch[item_id], config)
+        except LLMError:
+            # Left unset; the article's own classify stage retries and journals the failure
+            pass
+    return results
+
+def extract_company_names_batch(batch, config):
+    logging.info(f"Extracting company names from {len(batch)} articles")
+    results, missing = _run_batch(
+        batch, config,
+        instructions="For each article below, extract all company names mentioned as a JSON array of strings.",
+        example='{"a1": ["Apple Inc.", "Microsoft Corporation"], "a2": []}',
+        system_prompt="You are a helpful assistant that extracts company names from articles and returns them in a JSON object.",
+        is_valid=lambda value: isinstance(value, list) and all(isinstance(name, str) for name in value)
+    )
+    for item_id in missing:
+        try:
+            results[item_id] = extract_company_names(batch[item_id], config)
+        except LLMError:
+            pass
+    return results
+
+_yahoo_session = requests.Session()
+
+def get_ticker(company_name):
+    # Cached answers (including "no ticker") first, then the bundled ticker list; only
+    # names neither knows go to Yahoo
+    cache = get_entity_cache()
+    ticker = cache.get(company_name)
+    if ticker is not MISSING:
+        return ticker
+    ticker = get_ticker_index().lookup(company_name)
+    if ticker:
+        cache.put(company_name, ticker, 'index')
+        return ticker
+    try:
+        ticker = _search_yahoo(company_name)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        # Transport failures are not a verdict on the name, so nothing is cached
+        logging.error(f"Error searching Yahoo for {company_name}: {str(e)}")
+        return None
+    cache.put(company_name, ticker, 'yahoo')
+    return ticker
+
+def _search_yahoo(company_name):
+    yfinance_url = "https://query2.finance.yahoo.com/v1/finance/search"
+    user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
+    params = {"q": company_name, "quotes_count": 1, "country": "United States"}
+
+    rate_limiter.get_bucket('yahoo').acquire()
+    res = _yahoo_session.get(url=yfinance_url, params=params, headers={'User-Agent': user_agent}, timeout=10)
+    # HTTP errors raise so they are not cached as "no ticker"
+    res.raise_for_status()
+    data = res.json()
+    try:
+        company_code = data['quotes'][0]['symbol']
+        return company_code
+    except (IndexError, KeyError):
+        return None
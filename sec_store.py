@@ -0,0 +1,37 @@
+# sec_store.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from utils import CACHE_DIR
+
+class FilingSectionStore:
+    def __init__(self, path=os.path.join(CACHE_DIR, 'sec_filings.sqlite')):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS filing_sections ("
+            "accession_no TEXT PRIMARY KEY, form TEXT, filing_date TEXT, sections TEXT, parsed_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, accession_no):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sections FROM filing_sections WHERE accession_no = ?", (accession_no,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, accession_no, form, filing_date, sections):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO filing_sections (accession_no, form, filing_date, sections, parsed_at) VALUES (?, ?, ?, ?, ?)",
+                (accession_no, form, str(filing_date), json.dumps(sections), time.time())
+            )
+            self._conn.commit()
@@ -0,0 +1,74 @@
+# structured.py
+
+import json
+import re
+from pydantic import ValidationError
+
+FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+
+class StructuredOutputError(ValueError):
+    pass
+
+def extract_json(text):
+    # Pulls the first JSON value out of an LLM reply, tolerating markdown fences,
+    # prose around the JSON and replies cut off before the closing brackets
+    if text is None:
+        raise StructuredOutputError("Empty response")
+    fenced = FENCE_PATTERN.search(text)
+    if fenced:
+        text = fenced.group(1)
+    starts = [i for i in (text.find('{'), text.find('[')) if i >= 0]
+    if not starts:
+        raise StructuredOutputError(f"No JSON found in response: {text[:200]!r}")
+    start = min(starts)
+
+    decoder = json.JSONDecoder()
+    try:
+        value, _ = decoder.raw_decode(text, start)
+        return value
+    except json.JSONDecodeError:
+        pass
+    try:
+        value, _ = decoder.raw_decode(_close_truncated(text[start:].rstrip()))
+        return value
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"Unparseable JSON in response: {e}") from e
+
+def _close_truncated(fragment):
+    # Closes the objects of a reply cut off between complete values, dropping a trailing
+    # separator or an object key whose value never arrived. A cut inside a string, number
+    # or array would leave a plausible but partial value (a half company name, a short
+    # list), so it raises and the caller's repair or fallback path runs instead.
+    closers, in_string, escaped = [], False, False
+    for ch in fragment:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            closers.append('}' if ch == '{' else ']')
+        elif ch in '}]' and closers:
+            closers.pop()
+    if in_string:
+        raise StructuredOutputError("Response cut off inside a string")
+    if ']' in closers:
+        raise StructuredOutputError("Response cut off inside an array")
+    # With no array open, a string right after '{' or ',' is a key; a ',' before the cut
+    # means the value ahead of it was complete
+    fragment = re.sub(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*:?\s*$', r'\1', fragment.rstrip())
+    if fragment.endswith(','):
+        fragment = fragment[:-1]
+    elif not fragment.endswith(('}', ']', '"')):
+        raise StructuredOutputError("Response cut off inside a value")
+    return fragment + ''.join(reversed(closers))
+
+def parse_structured(text, schema):
+    try:
+        return schema.model_validate(extract_json(text))
+    except ValidationError as e:
+        raise StructuredOutputError(str(e)) from e
@@ -1,7 +1,13 @@
 # tests.py
 
 import requests
+import numpy as np
+import pandas as pd
 import config
+from indicators import compute_indicators
+from structured import extract_json, StructuredOutputError
+from feeds import iter_feed_items
+from valuation import dcf_grid, WACC_OFFSETS, SHORT_TERM_GROWTH, TERMINAL_GROWTH, FORECAST_YEARS
 
 def test_openrouter_connection(config):
     print("Testing OpenRouter API connection...")
@@ -39,11 +45,146 @@ def test_config_loading():
     print("All required config keys found")
     return True
 
+def test_indicator_parity():
+    print("Testing indicators against the pandas reference formulas...")
+    # The same definitions ta uses: Wilder smoothing for RSI and ATR, adjust=False EMAs
+    # for MACD, population standard deviation for the Bollinger bands
+    rng = np.random.default_rng(0)
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, (3, 300)), axis=1))
+    data = {'close': close, 'high': close * 1.01, 'low': close * 0.99, 'volume': rng.uniform(1e5, 1e6, close.shape)}
+    results = compute_indicators(data, ['rsi', 'macd', 'atr', 'bollinger'])
+    for row in range(close.shape[0]):
+        series = pd.Series(close[row])
+        change = series.diff()
+        avg_gain = change.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+        avg_loss = (-change).clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+        macd_line = series.ewm(span=12, adjust=False).mean() - series.ewm(span=26, adjust=False).mean()
+        high, low = pd.Series(data['high'][row]), pd.Series(data['low'][row])
+        true_range = pd.concat([high - low, (high - series.shift()).abs(), (low - series.shift()).abs()], axis=1).max(axis=1)
+        mid, std = series.rolling(20).mean(), series.rolling(20).std(ddof=0)
+        expected = {
+            'rsi': 100 - 100 / (1 + avg_gain / avg_loss),
+            'macd': macd_line,
+            'macd_signal': macd_line.ewm(span=9, adjust=False).mean(),
+            'atr': true_range.ewm(alpha=1 / 14, adjust=False).mean(),
+            'bb_percent_b': (series - (mid - 2 * std)) / (4 * std)
+        }
+        for name, values in expected.items():
+            # Seeding differs over the first bars, so only the settled tail is compared
+            if not np.allclose(results[name][row, -100:], values.to_numpy()[-100:], atol=1e-4):
+                print(f"Error: {name} differs from the reference for row {row}")
+                return False
+    print("RSI, MACD, ATR and Bollinger %B match the reference formulas")
+    return True
+
+def test_extract_json_truncated():
+    print("Testing JSON extraction from truncated replies...")
+    # Cut between complete values: the open objects are closed
+    recovered = [
+        ('{"a": 1, "b":', {'a': 1}),
+        ('{"a": [1, 2], "b"', {'a': [1, 2]}),
+        ('{"a": "x\\"y", ', {'a': 'x"y'}),
+        ('```json\n{"r1": {"score": 7, "justification": "ok"}, "r2": ', {'r1': {'score': 7, 'justification': 'ok'}}),
+    ]
+    # Cut inside a string, number or array: a partial value must not pass as complete
+    rejected = [
+        '```json\n{"score": 7, "justification": "Strong cata',
+        '{"companies": ["Faraday Future", "Rent the Run',
+        '{"a1": ["Micro',
+        '{"a": 1, "bee',
+        '{"a": 1, "b": [1, 2',
+        '{"a": 1, "b": 2',
+        'Here you go: [{"x": 1}, {"x": 2',
+        'No JSON here',
+    ]
+    for text, expected in recovered:
+        try:
+            value = extract_json(text)
+        except StructuredOutputError as e:
+            print(f"Error: {text!r} raised {e}")
+            return False
+        if value != expected:
+            print(f"Error: {text!r} gave {value!r}, expected {expected!r}")
+            return False
+    for text in rejected:
+        try:
+            value = extract_json(text)
+            print(f"Error: {text!r} was accepted as {value!r}")
+            return False
+        except StructuredOutputError:
+            pass
+    print(f"{len(recovered)} truncated replies recovered, {len(rejected)} rejected")
+    return True
+
+MALFORMED_FEED = b"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel><title>Test</title>
+<item><title>A</title><link>https://example.com/a</link></item>
+<item><title>B&nbsp;C</title><link>https://example.com/b</link></item>
+<item><title>AT&T &amp; Q&#x2019;s</title><link>https://example.com/c</link></item>
+<item><title>D</title><link>https://example.com/d</link><description><![CDATA[<p>x&nbsp;y & z</p>]]></description></item>
+</channel></rss>"""
+
+def test_malformed_feed():
+    print("Testing the streaming parser on a feed with HTML entities...")
+    expected = [
+        ('A', ''),
+        ('B\xa0C', ''),
+        ('AT&T & Q\u2019s', ''),
+        ('D', '<p>x&nbsp;y & z</p>'),
+    ]
+    # Small chunks split entities and the CDATA markers across feed() calls
+    for size in (len(MALFORMED_FEED), 64, 7, 1):
+        chunks = [MALFORMED_FEED[i:i + size] for i in range(0, len(MALFORMED_FEED), size)]
+        try:
+            items = [(item['title'], item['description']) for item in iter_feed_items(chunks)]
+        except Exception as e:
+            print(f"Error: parsing in {size}-byte chunks raised {e}")
+            return False
+        if items != expected:
+            print(f"Error: parsing in {size}-byte chunks gave {items!r}")
+            return False
+    print(f"All {len(expected)} items recovered")
+    return True
+
+def test_dcf_grid_closed_form():
+    print("Testing the DCF grid against the closed-form valuation...")
+    base_fcf, wacc = np.array([100.0, 250.0]), np.array([0.09, 0.02])
+    net_debt, shares = np.array([300.0, -50.0]), np.array([10.0, np.nan])
+    grid = dcf_grid(base_fcf, wacc, net_debt=net_debt, shares=shares)
+    n = FORECAST_YEARS
+    for i in range(len(base_fcf)):
+        for j, offset in enumerate(WACC_OFFSETS):
+            r = wacc[i] + offset
+            for k, g in enumerate(SHORT_TERM_GROWTH):
+                for m, g_terminal in enumerate(TERMINAL_GROWTH):
+                    value = grid[i, j, k, m]
+                    if r <= g_terminal:
+                        if not np.isnan(value):
+                            print(f"Error: expected NaN for wacc {r:.2f} <= terminal growth {g_terminal:.2f}")
+                            return False
+                        continue
+                    # Geometric series for the explicit years plus the discounted Gordon terminal value
+                    q = (1 + g) / (1 + r)
+                    explicit = base_fcf[i] * q * (1 - q ** n) / (1 - q) if q != 1 else base_fcf[i] * n
+                    terminal = base_fcf[i] * q ** n * (1 + g_terminal) / (r - g_terminal)
+                    expected = explicit + terminal - net_debt[i]
+                    if not np.isnan(shares[i]):
+                        expected /= shares[i]
+                    if not np.isclose(value, expected, rtol=1e-9):
+                        print(f"Error: grid[{i}, {j}, {k}, {m}] = {value}, expected {expected}")
+                        return False
+    print("DCF grid matches the closed form")
+    return True
+
 def run_all_tests():
 
     tests = [
         ("Config Loading", test_config_loading),
-        ("OpenRouter API Connection", lambda: test_openrouter_connection(config))
+        ("OpenRouter API Connection", lambda: test_openrouter_connection(config)),
+        ("Indicator Parity", test_indicator_parity),
+        ("Truncated JSON Extraction", test_extract_json_truncated),
+        ("DCF Grid Closed Form", test_dcf_grid_closed_form),
+        ("Malformed Feed Parsing", test_malformed_feed)
     ]
 
     results = []
@@ -0,0 +1,130 @@
+# ticker_resolver.py
+
+import csv
+import logging
+import os
+import re
+import threading
+from collections import defaultdict
+
+TICKERS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tickers_companies.csv')
+
+# Legal-form suffixes that never help tell two companies apart
+NAME_SUFFIXES = {
+    'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'ltd', 'limited',
+    'plc', 'llc', 'lp', 'sa', 'nv', 'ag', 'se', 'the'
+}
+
+def normalize_company_name(name):
+    tokens = re.sub(r'[^a-z0-9]+', ' ', name.lower()).split()
+    while tokens and tokens[-1] in NAME_SUFFIXES:
+        tokens.pop()
+    if tokens and tokens[0] == 'the':
+        tokens = tokens[1:]
+    return ' '.join(tokens)
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class TickerIndex:
+    def __init__(self, rows, fuzzy_threshold=0.6):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.by_name = {}
+        self.by_prefix = {}
+        self.symbols = set()
+        self.names = []
+        self.trigrams = []
+        self.postings = defaultdict(set)
+        for ticker, company in rows:
+            ticker = ticker.strip().upper()
+            key = normalize_company_name(company)
+            if not ticker or not key:
+                continue
+            self.symbols.add(ticker)
+            if key in self.by_name:
+                continue
+            self.by_name[key] = ticker
+            # Leading multi-word prefixes ("faraday future") resolve when unambiguous
+            tokens = key.split()
+            for n in range(2, len(tokens)):
+                prefix = ' '.join(tokens[:n])
+                self.by_prefix[prefix] = None if prefix in self.by_prefix else ticker
+            grams = _trigrams(key)
+            row_id = len(self.names)
+            self.names.append(key)
+            self.trigrams.append(grams)
+            for gram in grams:
+                self.postings[gram].add(row_id)
+
+        self._fuzzy_memo = {}
+        self._lock = threading.Lock()
+        self.stats = {'exact': 0, 'fuzzy': 0, 'miss': 0}
+
+    @classmethod
+    def from_csv(cls, path=TICKERS_CSV, **kwargs):
+        with open(path, newline='') as f:
+            reader = csv.DictReader(f)
+            rows = [(row['Ticker'], row['Company']) for row in reader]
+        return cls(rows, **kwargs)
+
+    def lookup(self, company_name):
+        key = normalize_company_name(company_name)
+        ticker = self.by_name.get(key)
+        if ticker is None and company_name.strip().upper() in self.symbols:
+            ticker = company_name.strip().upper()
+        if ticker is not None:
+            self._count('exact')
+            return ticker
+
+        ticker = self.by_prefix.get(key) or (self._fuzzy(key) if key else None)
+        self._count('fuzzy' if ticker else 'miss')
+        return ticker
+
+    def _fuzzy(self, key):
+        if key in self._fuzzy_memo:
+            return self._fuzzy_memo[key]
+        grams = _trigrams(key)
+        overlaps = defaultdict(int)
+        for gram in grams:
+            for row_id in self.postings.get(gram, ()):
+                overlaps[row_id] += 1
+
+        best_ticker, best_score = None, 0.0
+        for row_id, overlap in overlaps.items():
+            # Jaccard similarity over character trigrams
+            score = overlap / (len(grams) + len(self.trigrams[row_id]) - overlap)
+            if score > best_score:
+                best_ticker, best_score = self.by_name[self.names[row_id]], score
+        if best_score < self.fuzzy_threshold:
+            best_ticker = None
+        self._fuzzy_memo[key] = best_ticker
+        return best_ticker
+
+    def _count(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def log_stats(self):
+        total = sum(self.stats.values())
+        if not total:
+            return
+        hits = self.stats['exact'] + self.stats['fuzzy']
+        logging.info(
+            f"Ticker index: {hits}/{total} names resolved locally ({hits / total:.0%}), "
+            f"{self.stats['exact']} exact, {self.stats['fuzzy']} fuzzy, {self.stats['miss']} sent to Yahoo"
+        )
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_ticker_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = TickerIndex.from_csv()
+            except (OSError, KeyError) as e:
+                logging.error(f"Failed to load ticker index from {TICKERS_CSV}: {e}")
+                _index = TickerIndex([])
+        return _index
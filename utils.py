@@ -2,15 +2,13 @@
 
 import logging
 import requests
-import feedparser
 from datetime import datetime
 from email.mime.text import MIMEText
 import smtplib
 import os
 import json
-import time
 from functools import wraps
-import threading
+from rate_limiter import TokenBucket
 import csv
 from datetime import datetime
 
@@ -20,16 +18,12 @@ def setup_logging():
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 def fetch_rss_feeds(feed_urls):
+    from feeds import iter_feed_items, FEED_CHUNK_SIZE  # feeds imports CACHE_DIR from here
     articles = []
     for url in feed_urls:
-        feed = feedparser.parse(url)
-        for entry in feed.entries:
-            articles.append({
-                'title': entry.title,
-                'link': entry.link,
-                'published': entry.get('published', ''),
-                'summary': entry.get('summary', '')
-            })
+        with requests.get(url, stream=True, timeout=15) as response:
+            response.raise_for_status()
+            articles.extend(iter_feed_items(response.iter_content(chunk_size=FEED_CHUNK_SIZE)))
     return articles
 
 # def send_email(subject, body, config):
@@ -71,21 +65,14 @@ def get_cached_data(key):
         return data
     return None
 
-# Rate limiting decorator
-def rate_limit(max_per_second):
-    min_interval = 1.0 / float(max_per_second)
-    lock = threading.Lock()
-    last_time_called = [0.0]
-
+# Rate limiting decorator, backed by a token bucket per decorated function
+def rate_limit(max_per_second, burst=1):
     def decorator(func):
+        bucket = TokenBucket(func.__qualname__, max_per_second, burst)
+
         @wraps(func)
         def rate_limited_function(*args, **kwargs):
-            with lock:
-                elapsed = time.time() - last_time_called[0]
-                left_to_wait = min_interval - elapsed
-                if left_to_wait > 0:
-                    time.sleep(left_to_wait)
-                last_time_called[0] = time.time()
+            bucket.acquire()
             return func(*args, **kwargs)
         return rate_limited_function
-    return decorator
\ No newline at end of file
+    return decorator
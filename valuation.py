@@ -0,0 +1,70 @@
+# valuation.py
+
+import numpy as np
+
+# Sensitivity grid: WACC offsets around each ticker's own WACC, and absolute growth rates
+WACC_OFFSETS = np.array([-0.02, -0.01, 0.0, 0.01, 0.02])
+SHORT_TERM_GROWTH = np.array([0.0, 0.025, 0.05, 0.075, 0.10])
+TERMINAL_GROWTH = np.array([0.01, 0.02, 0.03, 0.04])
+FORECAST_YEARS = 5
+PERCENTILES = [10, 25, 50, 75, 90]
+
+def dcf_grid(base_fcf, wacc, net_debt=None, shares=None,
+             wacc_offsets=WACC_OFFSETS, short_term_growth=SHORT_TERM_GROWTH,
+             terminal_growth=TERMINAL_GROWTH, years=FORECAST_YEARS):
+    # Value per share (or equity value when shares are unknown) for every ticker and
+    # every (wacc, short-term growth, terminal growth) combination, in one broadcast.
+    # Result shape: (tickers, len(wacc_offsets), len(short_term_growth), len(terminal_growth))
+    base_fcf = np.asarray(base_fcf, dtype=float)[:, None, None, None, None]
+    rates = (np.asarray(wacc, dtype=float)[:, None] + wacc_offsets[None, :])[:, :, None, None, None]
+    g_short = np.asarray(short_term_growth, dtype=float)[None, None, :, None, None]
+    g_terminal = np.asarray(terminal_growth, dtype=float)[None, None, None, :, None]
+    t = np.arange(1, years + 1, dtype=float)[None, None, None, None, :]
+
+    discount = (1.0 + rates) ** t
+    cash_flows = base_fcf * (1.0 + g_short) ** t
+    explicit = (cash_flows / discount).sum(axis=-1)
+
+    final_fcf = cash_flows[..., -1]
+    rates, g_terminal = rates[..., 0], g_terminal[..., 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terminal = final_fcf * (1.0 + g_terminal) / (rates - g_terminal) / discount[..., -1]
+        # Gordon growth is undefined when the discount rate does not exceed terminal growth
+        value = np.where(rates > g_terminal, explicit + terminal, np.nan)
+
+    if net_debt is not None:
+        value = value - np.nan_to_num(np.asarray(net_debt, dtype=float))[:, None, None, None]
+    if shares is not None:
+        shares = np.asarray(shares, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            per_share = value / np.where(shares > 0, shares, np.nan)[:, None, None, None]
+        value = np.where(np.isnan(shares)[:, None, None, None], value, per_share)
+    return value
+
+def summarize_grid(grid, prices=None, base_index=(2, 2, 2)):
+    # Distribution summary per ticker; base_index picks the centre WACC, 5% and 3% growth
+    flat = grid.reshape(grid.shape[0], -1)
+    with np.errstate(invalid='ignore'):
+        percentiles = np.nanpercentile(flat, PERCENTILES, axis=1) if flat.size else np.empty((len(PERCENTILES), 0))
+    summaries = []
+    for row in range(grid.shape[0]):
+        values = flat[row][~np.isnan(flat[row])]
+        if not len(values):
+            summaries.append(None)
+            continue
+        summary = {
+            'base_case': _round(grid[(row,) + tuple(base_index)]),
+            'percentiles': {f'p{p}': _round(percentiles[i, row]) for i, p in enumerate(PERCENTILES)},
+            'scenarios': int(len(values))
+        }
+        price = prices[row] if prices is not None else None
+        if price:
+            median = percentiles[PERCENTILES.index(50), row]
+            summary['price'] = price
+            summary['margin_of_safety'] = _round((median - price) / median) if median > 0 else None
+            summary['share_of_scenarios_above_price'] = _round(float((values > price).mean()))
+        summaries.append(summary)
+    return summaries
+
+def _round(value):
+    return None if value is None or np.isnan(value) else round(float(value), 4)